@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+# @Author: Jaume Bonet
+# @Date:   2016-04-30 09:52:16
+# @Last Modified by:   Jaume Bonet
+# @Last Modified time: 2016-04-30 09:52:16
+"""
+Set operations between ConstraintArrays on their residue pairs.
+
+Pairs are matched through the sorted pair keys of ConstraintArray.index(),
+so each array contributes at most one row per pair (the last one added).
+The rows kept are gathered from each input once and concatenated, in the
+order of the inputs and of their rows.
+
+When several inputs hold the same pair, the policy decides the row kept:
+
+first  -- the one of the earliest input
+last   -- the one of the latest input
+min    -- the one with the lowest value (earliest on ties)
+max    -- the one with the highest value (earliest on ties)
+mean   -- the one of the earliest input, with the mean of the values
+error  -- raise a ValueError
+"""
+import numpy as np
+
+from .ConstraintArray import ConstraintArray
+
+
+class ConstraintAlgebra(object):
+    """Pair-indexed union, intersection, difference and filtering"""
+    POLICIES = ("first", "last", "min", "max", "mean", "error")
+
+    @staticmethod
+    def combine(arrays, policy="last", everywhere=False):
+        """
+        Union of the pairs of the arrays or, with everywhere, only the
+        pairs present in all of them.
+        """
+        if policy not in ConstraintAlgebra.POLICIES:
+            raise ValueError("Unknown policy {0}; use one of {1}".format(policy, ", ".join(ConstraintAlgebra.POLICIES)))
+        keys, source, rows, value = [], [], [], []
+        for i, data in enumerate(arrays):
+            k, r = data.index()
+            keys.append(k)
+            rows.append(r)
+            value.append(data.value[r])
+            source.append(np.full(len(k), i, dtype=np.int64))
+        keys   = np.concatenate(keys)
+        source = np.concatenate(source)
+        rows   = np.concatenate(rows)
+        value  = np.concatenate(value)
+
+        if   policy == "last": order = np.lexsort((-source, keys))
+        elif policy == "min":  order = np.lexsort((source, value, keys))
+        elif policy == "max":  order = np.lexsort((source, -value, keys))
+        else:                  order = np.lexsort((source, keys))
+        skey  = keys[order]
+        start = np.flatnonzero(np.append(True, skey[1:] != skey[:-1])[:len(skey)])
+        size  = np.diff(np.append(start, len(skey)))
+        if policy == "error" and np.any(size > 1):
+            raise ValueError("{0} residue pairs have more than one constraint".format(int(np.sum(size > 1))))
+        mean = np.add.reduceat(value[order], start) / size if policy == "mean" and len(start) > 0 else None
+        if everywhere:
+            full  = size == len(arrays)
+            start = start[full]
+            if mean is not None: mean = mean[full]
+        pick = order[start]
+
+        # Back to input order: by source, then by row
+        final  = np.lexsort((rows[pick], source[pick]))
+        pick   = pick[final]
+        parts  = [arrays[i].take(np.sort(rows[pick][source[pick] == i])) for i in range(len(arrays))]
+        result = ConstraintArray.concatenate(parts)
+        if mean is not None:
+            result._value[:len(result)] = mean[final]
+        return result
+
+    @staticmethod
+    def difference(data, other):
+        """Rows of data (one per pair) whose pair is not in other"""
+        keys, rows = data.index()
+        rows = np.sort(rows)
+        keep = other.find(data.num1[rows], data.num2[rows]) < 0
+        return data.take(rows[keep])
+
+    @staticmethod
+    def select(data, mask=None, min_separation=None, max_separation=None, top=None, key="dev"):
+        """
+        Rows of data matching all the given conditions: a boolean mask, a
+        sequence separation |num1 - num2| range and, among those, the top
+        rows with the lowest key (a column name or an array of scores).
+        """
+        keep = np.ones(len(data), dtype=bool) if mask is None else np.asarray(mask, dtype=bool).copy()
+        sep  = np.abs(data.num1.astype(np.int64) - data.num2)
+        if min_separation is not None: keep &= sep >= min_separation
+        if max_separation is not None: keep &= sep <= max_separation
+        rows = np.flatnonzero(keep)
+        if top is not None:
+            score = getattr(data, key) if isinstance(key, str) else np.asarray(key)
+            rows  = np.sort(rows[np.argsort(score[rows], kind="mergesort")[:top]])
+        return data.take(rows)
@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+# @Author: Jaume Bonet
+# @Date:   2016-04-25 10:02:41
+# @Last Modified by:   Jaume Bonet
+# @Last Modified time: 2016-04-25 10:02:41
+"""
+Columnar (struct-of-arrays) storage for Rosetta constraints.
+
+Residue numbers, values and deviations are numeric arrays; constraint
+type, atom names, function and tag are integer codes into per-column
+label lists.  Arrays grow by doubling, so rows can still be added one at
+a time.
+
+Residue pairs are looked up through a sorted array of symmetric pair keys
+built on demand; as with a dictionary, the last constraint added for a
+pair is the one found.
+"""
+import numpy as np
+
+
+def _column(name):
+    def getter(self):
+        return getattr(self, "_" + name)[:self._size]
+    return property(getter)
+
+
+class ConstraintArray(object):
+    """Columnar storage of a set of Constraints"""
+    _DTYPES = {"num1": np.int32, "num2": np.int32, "value": np.float64, "dev": np.float64}
+    LABELS  = ("ctype", "atm1", "atm2", "func", "tag")
+    COLUMNS = ("ctype", "atm1", "num1", "atm2", "num2", "func", "value", "dev", "tag")
+
+    def __init__(self):
+        self._size = 0
+        for c in self.COLUMNS:
+            setattr(self, "_" + c, np.zeros(0, dtype=self._DTYPES.get(c, np.int32)))
+        self.labels = dict((c, []) for c in self.LABELS)
+        self._codes = dict((c, {}) for c in self.LABELS)
+        self._keys  = None
+        self._rows  = None
+
+    ctype = _column("ctype")
+    atm1  = _column("atm1")
+    num1  = _column("num1")
+    atm2  = _column("atm2")
+    num2  = _column("num2")
+    func  = _column("func")
+    value = _column("value")
+    dev   = _column("dev")
+    tag   = _column("tag")
+
+    @staticmethod
+    def from_columns(columns):
+        """
+        Build the storage from a dictionary of column lists or arrays, the
+        label columns holding strings.
+        """
+        data = ConstraintArray()
+        for c in data.COLUMNS:
+            if c in data._DTYPES:
+                values = np.asarray(columns[c], dtype=data._DTYPES[c])
+            else:
+                texts  = [str(x) for x in columns[c]] if isinstance(columns[c], np.ndarray) else columns[c]
+                data.labels[c] = sorted(set(texts))
+                data._codes[c] = dict((x, i) for i, x in enumerate(data.labels[c]))
+                values = np.array(list(map(data._codes[c].__getitem__, texts)), dtype=np.int32)
+            setattr(data, "_" + c, values)
+        data._size = len(data._num1)
+        return data
+
+    def _code(self, column, label):
+        codes = self._codes[column]
+        if label not in codes:
+            codes[label] = len(self.labels[column])
+            self.labels[column].append(label)
+        return codes[label]
+
+    def append(self, num1, num2, value, ctype, atm1, atm2, func, dev, tag):
+        if self._size == len(self._num1):
+            capacity = max(16, 2 * self._size)
+            for c in self.COLUMNS:
+                grown = np.zeros(capacity, dtype=self._DTYPES.get(c, np.int32))
+                grown[:self._size] = getattr(self, c)
+                setattr(self, "_" + c, grown)
+        row = self._size
+        self._num1[row]  = num1
+        self._num2[row]  = num2
+        self._value[row] = value
+        self._dev[row]   = dev
+        for c, label in zip(self.LABELS, (ctype, atm1, atm2, func, tag)):
+            getattr(self, "_" + c)[row] = self._code(c, label)
+        self._size += 1
+        self._keys  = None
+
+    def label(self, column, row):
+        """Text of a label column at a row"""
+        return self.labels[column][getattr(self, column)[row]]
+
+    def text(self, column, rows=slice(None)):
+        """Text of a label column for the given rows (all by default)"""
+        return np.array(self.labels[column] or [""], dtype=str)[getattr(self, column)[rows]]
+
+    def take(self, rows):
+        """New ConstraintArray with the given rows and a copy of the label lists"""
+        data = ConstraintArray()
+        for c in self.COLUMNS:
+            setattr(data, "_" + c, getattr(self, c)[rows])
+        data._size  = len(data._num1)
+        data.labels = dict((c, list(x)) for c, x in self.labels.items())
+        data._codes = dict((c, dict(x)) for c, x in self._codes.items())
+        return data
+
+    @staticmethod
+    def concatenate(arrays):
+        """
+        New ConstraintArray with the rows of all the arrays in order.  Label
+        codes of the later arrays are translated into those of the first.
+        """
+        data = arrays[0].take(slice(None))
+        if len(arrays) == 1: return data
+        for c in data.COLUMNS:
+            values = [getattr(data, c)]
+            for other in arrays[1:]:
+                codes = getattr(other, c)
+                if c in data.LABELS:
+                    table = np.array([data._code(c, x) for x in other.labels[c]] or [0], dtype=np.int32)
+                    codes = table[codes]
+                values.append(codes)
+            setattr(data, "_" + c, np.concatenate(values))
+        data._size = len(data._num1)
+        return data
+
+    @staticmethod
+    def pair_key(r1, r2):
+        """Symmetric int64 key of residue pairs"""
+        r1 = np.asarray(r1, dtype=np.int64)
+        r2 = np.asarray(r2, dtype=np.int64)
+        return np.minimum(r1, r2) * (2 ** 32) + (np.maximum(r1, r2) + 2 ** 31)
+
+    def index(self):
+        """Sorted unique pair keys and the row holding each of them"""
+        if self._keys is None:
+            keys  = self.pair_key(self.num1, self.num2)
+            order = np.argsort(keys, kind="mergesort")
+            keys  = keys[order]
+            last  = np.append(keys[1:] != keys[:-1], True)[:len(keys)]
+            self._keys = keys[last]
+            self._rows = order[last]
+        return self._keys, self._rows
+
+    def find(self, r1, r2):
+        """Row of the constraint between each pair of residues, or -1"""
+        keys, rows = self.index()
+        query = self.pair_key(r1, r2)
+        if len(keys) == 0: return np.full(query.shape, -1, dtype=np.int64)
+        pos = np.minimum(np.searchsorted(keys, query), len(keys) - 1)
+        return np.where(keys[pos] == query, rows[pos], -1)
+
+    @property
+    def nbytes(self):
+        return sum(getattr(self, c).nbytes for c in self.COLUMNS)
+
+    def __len__(self):
+        return self._size
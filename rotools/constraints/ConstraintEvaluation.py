@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+# @Author: Jaume Bonet
+# @Date:   2016-04-27 11:05:32
+# @Last Modified by:   Jaume Bonet
+# @Last Modified time: 2016-04-27 11:05:32
+"""
+Batched evaluation of constraints against coordinates.
+
+Coordinates are (residues x 3) for one model or (models x residues x 3)
+for several, the first row being residue 'first'.  A dictionary of atom
+name to such arrays gives each atom of the constraints its own
+coordinates; a plain array is used for every atom.  Residues outside the
+arrays, unknown atoms and NaN coordinates give NaN distances, which are
+neither satisfied nor violated.
+
+A constraint is satisfied when |distance - value| <= dev, or the given
+tolerance.  Energies follow the Rosetta HARMONIC function,
+((distance - value) / dev) ** 2, and are NaN for other functions.
+"""
+import numpy as np
+
+
+class ConstraintEvaluation(object):
+    """Distances, deviations and energies of a ConstraintArray"""
+
+    @staticmethod
+    def gather(data, coords, atom, num, first=1):
+        """(models x constraints x 3) coordinates of one end of the constraints"""
+        if not isinstance(coords, dict):
+            coords = dict((x, coords) for x in data.labels[atom])
+        names  = data.labels[atom]
+        codes  = getattr(data, atom)
+        rows   = getattr(data, num).astype(np.int64) - first
+        shape  = np.shape(next(iter(coords.values()))) if coords else (0, 3)
+        models = 1 if len(shape) == 2 else shape[0]
+        points = np.full((models, len(data), 3), np.nan)
+        for code, name in enumerate(names):
+            if name not in coords: continue
+            xyz  = np.asarray(coords[name], dtype=np.float64).reshape(models, -1, 3)
+            pick = (codes == code) & (rows >= 0) & (rows < xyz.shape[1])
+            points[:, pick] = xyz[:, rows[pick]]
+        return points
+
+    @staticmethod
+    def compute(data, coords, first=1, tolerance=None):
+        """
+        Dictionary of (models x constraints) arrays, or (constraints,) ones
+        for a single model: distance, deviation (distance - value),
+        satisfied, violated and energy.
+        """
+        sample = next(iter(coords.values())) if isinstance(coords, dict) else coords
+        single = np.ndim(sample) == 2
+        a = ConstraintEvaluation.gather(data, coords, "atm1", "num1", first)
+        b = ConstraintEvaluation.gather(data, coords, "atm2", "num2", first)
+        distance  = np.sqrt(np.sum((a - b) ** 2, axis=-1))
+        deviation = distance - data.value
+        limit     = data.dev if tolerance is None else tolerance
+        with np.errstate(invalid="ignore", divide="ignore"):
+            satisfied = np.abs(deviation) <= limit
+            energy    = (deviation / data.dev) ** 2
+        harmonic = data._codes["func"].get("HARMONIC", -1)
+        energy[:, data.func != harmonic] = np.nan
+        result = {"distance": distance, "deviation": deviation, "satisfied": satisfied,
+                  "violated": ~satisfied & ~np.isnan(distance), "energy": energy}
+        if single:
+            result = dict((k, v[0]) for k, v in result.items())
+        return result
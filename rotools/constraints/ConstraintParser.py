@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+# @Author: Jaume Bonet
+# @Date:   2016-04-26 09:44:18
+# @Last Modified by:   Jaume Bonet
+# @Last Modified time: 2016-04-26 09:44:18
+"""
+Bulk reader and writer of Rosetta pair constraint files.
+
+Lines are 'ctype atm1 num1 atm2 num2 func [params...]'.  Comments (from
+'#' to the end of the line) and blank lines are skipped.  The first two
+function parameters are stored as value and dev; anything after them is
+kept verbatim as the tag.  A missing parameter is NaN and is not written
+back.  HARMONIC rows are written with the usual '.2f .1f' layout; the
+parameters of any other function are written in full (shortest repr), so
+reading and writing them back does not change their values.
+
+Files whose lines all have the usual nine fields are split and converted
+column by column; any other file goes through the per-line path.
+"""
+import numpy as np
+
+from .ConstraintArray import ConstraintArray
+
+
+class ConstraintParser(object):
+    """Bulk conversion between constraint files and ConstraintArray"""
+    _CHUNK  = 1 << 14
+    _FORMAT = "{0} {1} {2} {3} {4} {5} {6:.2f} {7:.1f} {8}"
+
+    @staticmethod
+    def parse(filename):
+        """ConstraintArray of a constraint file"""
+        with open(filename) as fd:
+            return ConstraintParser.parse_text(fd.read())
+
+    @staticmethod
+    def parse_text(text):
+        """
+        ConstraintArray of the text of a constraint file.  When there are
+        no comments and every non-blank line has nine fields, the whole
+        text is split at once and each column converted in one go.
+        """
+        if "#" not in text and ConstraintParser._regular(text):
+            tokens  = text.split()
+            columns = dict((c, tokens[i::9]) for i, c in enumerate(ConstraintArray.COLUMNS))
+            try:
+                for c in ("num1", "num2", "value", "dev"):
+                    columns[c] = np.array(columns[c], dtype=np.float64)
+            except ValueError:
+                return ConstraintParser.parse_lines(text.splitlines())
+            if np.all(columns["num1"] % 1 == 0) and np.all(columns["num2"] % 1 == 0):
+                return ConstraintArray.from_columns(columns)
+        return ConstraintParser.parse_lines(text.splitlines())
+
+    @staticmethod
+    def _regular(text):
+        """True if every non-blank line of the text has exactly nine fields"""
+        chars = np.frombuffer(text.encode("ascii", "replace"), dtype=np.uint8)
+        if len(chars) == 0: return True
+        blank = (chars == ord(" ")) | (chars == ord("\t")) | (chars == ord("\r"))
+        eol   = chars == ord("\n")
+        token = ~(blank | eol)
+        start = token.copy()
+        start[1:] &= ~token[:-1]
+        ends  = np.flatnonzero(eol)
+        count = np.bincount(np.searchsorted(ends, np.flatnonzero(start)), minlength=len(ends) + 1)
+        return bool(np.all((count == 9) | (count == 0)))
+
+    @staticmethod
+    def parse_lines(lines):
+        """ConstraintArray of a list of lines, whatever their number of fields"""
+        columns = dict((c, []) for c in ConstraintArray.COLUMNS)
+        for tokens in ConstraintParser._tokens(lines):
+            if len(tokens) < 6: raise ValueError("Wrong constraint line: {0}".format(" ".join(tokens)))
+            params = list(tokens[6:])
+            value  = ConstraintParser._number(params)
+            dev    = ConstraintParser._number(params) if not np.isnan(value) else np.nan
+            for c, x in zip(ConstraintArray.COLUMNS[:6], tokens[:6]):
+                columns[c].append(x)
+            columns["value"].append(value)
+            columns["dev"].append(dev)
+            columns["tag"].append(" ".join(params))
+        return ConstraintArray.from_columns(columns)
+
+    @staticmethod
+    def _tokens(lines):
+        for line in lines:
+            if "#" in line: line = line[:line.index("#")]
+            tokens = line.split()
+            if len(tokens) > 0: yield tokens
+
+    @staticmethod
+    def _number(params):
+        """Pops the first parameter if it is a number, NaN otherwise"""
+        if len(params) == 0: return np.nan
+        try:
+            value = float(params[0])
+        except ValueError:
+            return np.nan
+        params.pop(0)
+        return value
+
+    @staticmethod
+    def lines(data, ini=0, end=None):
+        """Text lines of the rows ini:end of a ConstraintArray"""
+        if end is None: end = len(data)
+        text   = [data.text(c, slice(ini, end)).tolist() for c in ConstraintArray.LABELS]
+        ctype, atm1, atm2, func, tag = text
+        num1   = data.num1[ini:end].tolist()
+        num2   = data.num2[ini:end].tolist()
+        value  = data.value[ini:end].tolist()
+        dev    = data.dev[ini:end].tolist()
+        fmt    = ConstraintParser._FORMAT
+        lines  = []
+        for row in zip(ctype, atm1, num1, atm2, num2, func, value, dev, tag):
+            if row[5] == "HARMONIC" and row[6] == row[6] and row[7] == row[7] and row[8]:
+                lines.append(fmt.format(*row))
+            else:
+                lines.append(ConstraintParser._line(row))
+        return lines
+
+    @staticmethod
+    def _line(row):
+        text = ["{0} {1} {2} {3} {4} {5}".format(*row[:6])]
+        if row[5] == "HARMONIC":
+            if row[6] == row[6]: text.append("{0:.2f}".format(row[6]))
+            if row[7] == row[7]: text.append("{0:.1f}".format(row[7]))
+        else:
+            if row[6] == row[6]: text.append(ConstraintParser._float(row[6]))
+            if row[7] == row[7]: text.append(ConstraintParser._float(row[7]))
+        if row[8]: text.append(row[8])
+        return " ".join(text)
+
+    @staticmethod
+    def _float(value):
+        """Shortest text giving back the same float ('0' rather than '0.0')"""
+        text = repr(float(value))
+        return text[:-2] if text.endswith(".0") else text
+
+    @staticmethod
+    def chunks(data, size=_CHUNK):
+        """Text of a ConstraintArray in blocks of rows, each line ending in a newline"""
+        for ini in range(0, len(data), size):
+            yield "\n".join(ConstraintParser.lines(data, ini, ini + size)) + "\n"
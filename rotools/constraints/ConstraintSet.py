@@ -2,7 +2,16 @@
 # @Author: Jaume Bonet
 # @Date:   2016-03-17 13:11:24
 # @Last Modified by:   Jaume Bonet
-# @Last Modified time: 2016-04-07 07:23:57
+# @Last Modified time: 2016-04-25 10:02:41
+import io
+
+import numpy as np
+
+from .ConstraintArray import ConstraintArray
+from .ConstraintParser import ConstraintParser
+from .ConstraintEvaluation import ConstraintEvaluation
+from .ConstraintTracker import ConstraintTracker
+from .ConstraintAlgebra import ConstraintAlgebra
 
 
 class Constraint(object):
@@ -26,42 +35,170 @@ class Constraint(object):
         return "{0.ctype} {1} {2} {3}".format(self, atm1, atm2, func)
 
 
+def _label(name):
+    def getter(self):
+        return self._array.label(name, self._row)
+    return property(getter)
+
+
+def _number(name, cast):
+    def getter(self):
+        return cast(getattr(self._array, name)[self._row])
+    return property(getter)
+
+
+class ConstraintView(Constraint):
+    """Read-only Constraint over a row of a ConstraintArray"""
+    def __init__(self, array, row):
+        self._array = array
+        self._row   = row
+
+    ctype = _label("ctype")
+    atm1  = _label("atm1")
+    num1  = _number("num1", int)
+    atm2  = _label("atm2")
+    num2  = _number("num2", int)
+    func  = _label("func")
+    value = _number("value", float)
+    dev   = _number("dev", float)
+    tag   = _label("tag")
+
+    def __str__(self):
+        return ConstraintParser.lines(self._array, self._row, self._row + 1)[0]
+
+
 class ConstraintSet(object):
     """ConstraintSet"""
     def __init__(self):
-        self.constraints = []
-        self.constrnsidx = {}
+        self.data = ConstraintArray()
+
+    @property
+    def constraints(self):
+        return [ConstraintView(self.data, x) for x in range(len(self.data))]
 
     @staticmethod
     def parse(filename):
+        """
+        Read a constraint file at once (see ConstraintParser); comments and
+        blank lines are skipped.
+        """
+        c = ConstraintSet()
+        c.data = ConstraintParser.parse(filename)
+        return c
+
+    @staticmethod
+    def from_arrays(num1, num2, value, ctype="AtomPair", atm1="CA", atm2="CA",
+                    func="HARMONIC", dev=3.0, tag="TAG"):
+        """
+        New set from arrays of residue numbers and values; the other fields
+        are either arrays or a single value for all the constraints.
+        """
+        num1    = np.asarray(num1, dtype=np.int64)
+        columns = {"num1": num1, "num2": num2, "value": value, "dev": np.broadcast_to(dev, num1.shape)}
+        for name, label in (("ctype", ctype), ("atm1", atm1), ("atm2", atm2), ("func", func), ("tag", tag)):
+            columns[name] = [label] * len(num1) if isinstance(label, str) else label
         c = ConstraintSet()
-        with open(filename) as fd:
-            for line in fd:
-                l = line.strip().split()
-                c.add_constraint(l[2], l[4], l[6], l[0], l[1], l[3], l[5], l[7], l[8])
+        c.data = ConstraintArray.from_columns(columns)
         return c
 
     def add_constraint(self, num1, num2, value, ctype="AtomPair", atm1="CA",
                        atm2="CA", func="HARMONIC", dev=3.0, tag="TAG"):
-        c = Constraint(int(num1), int(num2), value, ctype, atm1, atm2, func, dev, tag)
-        self.constraints.append(c)
-        self.constrnsidx.setdefault(int(num1), {})[int(num2)] = c
-        self.constrnsidx.setdefault(int(num2), {})[int(num1)] = c
+        self.data.append(int(num1), int(num2), float(value), ctype, atm1, atm2, func, float(dev), tag)
 
     def has_contact(self, r1, r2):
-        return int(r1) in self.constrnsidx and int(r2) in self.constrnsidx[int(r1)]
+        return bool(self.data.find(int(r1), int(r2)) >= 0)
 
     def get_contact(self, r1, r2):
-        return self.constrnsidx[int(r1)][int(r2)]
+        row = int(self.data.find(int(r1), int(r2)))
+        if row < 0: raise KeyError((r1, r2))
+        return ConstraintView(self.data, row)
+
+    def has_contacts(self, r1, r2):
+        """Boolean mask of the residue pairs (arrays r1, r2) with a constraint"""
+        return self.data.find(r1, r2) >= 0
+
+    def get_contacts(self, r1, r2):
+        """Row in data of the constraint of each residue pair, or -1"""
+        return self.data.find(r1, r2)
+
+    def evaluate(self, coords, first=1, tolerance=None):
+        """
+        Evaluate every constraint on one model, (residues x 3), or on a stack
+        of models, (models x residues x 3); coords can also map atom names
+        to such arrays.  Returns distance, deviation, satisfied, violated and
+        HARMONIC energy arrays (see ConstraintEvaluation).
+        """
+        return ConstraintEvaluation.compute(self.data, coords, first, tolerance)
+
+    def track(self, paths, series=True, first=1, tolerance=None):
+        """
+        Evaluate the constraints on every model of a set of PDB files
+        (multi-model files, directories of snapshots or glob patterns), read
+        one file at a time.  Returns a ConstraintTracker with the per-model
+        series (if series) and the per-constraint summary().
+        """
+        files   = ConstraintTracker.sources(paths)
+        tracker = ConstraintTracker(self.data, len(files), series, first, tolerance)
+        for x in files:
+            tracker.add_pdb(x)
+        return tracker
+
+    @staticmethod
+    def _wrap(data):
+        c = ConstraintSet()
+        c.data = data
+        return c
+
+    @staticmethod
+    def merge(csets, policy="last"):
+        """
+        New set with every residue pair of the given sets, one constraint
+        per pair chosen by policy (see ConstraintAlgebra).
+        """
+        return ConstraintSet._wrap(ConstraintAlgebra.combine([x.data for x in csets], policy))
+
+    def union(self, other, policy="last"):
+        return ConstraintSet.merge([self, other], policy)
+
+    def intersection(self, other, policy="first"):
+        """New set with the residue pairs constrained in both sets"""
+        return ConstraintSet._wrap(ConstraintAlgebra.combine([self.data, other.data], policy, True))
+
+    def difference(self, other):
+        """New set with the residue pairs not constrained in other"""
+        return ConstraintSet._wrap(ConstraintAlgebra.difference(self.data, other.data))
+
+    def filter(self, mask=None, min_separation=None, max_separation=None, top=None, key="dev"):
+        """
+        New set with the constraints that match a boolean mask, a sequence
+        separation range and, of those, the top with the lowest key (a
+        column name, such as 'dev' or 'value', or an array of scores).
+        """
+        return ConstraintSet._wrap(ConstraintAlgebra.select(self.data, mask, min_separation,
+                                                            max_separation, top, key))
 
     def __getitem__(self, key):
-        return self.constraints[key]
+        if isinstance(key, slice):
+            return [ConstraintView(self.data, x) for x in range(*key.indices(len(self)))]
+        if key < 0: key += len(self)
+        if key < 0 or key >= len(self): raise IndexError(key)
+        return ConstraintView(self.data, key)
 
     def __len__(self):
-        return len(self.constraints)
+        return len(self.data)
+
+    def write(self, output):
+        """
+        Write the constraints to a file name or an open file in blocks of
+        rows; the text is that of str() plus a final newline.
+        """
+        if isinstance(output, str):
+            with open(output, "w") as fd:
+                self.write(fd)
+            return
+        binary = not isinstance(output, io.TextIOBase)
+        for text in ConstraintParser.chunks(self.data):
+            output.write(text.encode("ascii") if binary else text)
 
     def __str__(self):
-        text = []
-        for x in range(len(self.constraints)):
-            text.append(str(self.constraints[x]))
-        return "\n".join(text)
+        return "".join(ConstraintParser.chunks(self.data))[:-1]
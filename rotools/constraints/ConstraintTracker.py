@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+# @Author: Jaume Bonet
+# @Date:   2016-04-29 10:31:48
+# @Last Modified by:   Jaume Bonet
+# @Last Modified time: 2016-04-29 10:31:48
+"""
+Constraint satisfaction across an ensemble of models.
+
+Models are added one at a time (or one stack at a time), and PDB files are
+read model by model, so only the current model is ever in memory.  Per-constraint aggregates (valid
+count, sum and sum of squares of the distances, minimum, maximum and
+satisfied count) are updated as models arrive.
+
+With series=True the (models x constraints) distances and satisfied flags
+are also kept, as float32 and bool arrays preallocated for the expected
+number of models and grown by doubling when needed.  With series=False
+memory stays proportional to the number of constraints.
+"""
+import os
+import glob
+
+import numpy as np
+
+from .ConstraintEvaluation import ConstraintEvaluation
+
+
+class ConstraintTracker(object):
+    """Per-constraint time series and satisfaction statistics"""
+
+    def __init__(self, data, models=0, series=True, first=1, tolerance=None):
+        n = len(data)
+        self.data      = data
+        self.first     = first
+        self.tolerance = tolerance
+        self.series    = series
+        self.labels    = []
+        self._size     = 0
+        self._distance = np.zeros((models if series else 0, n), dtype=np.float32)
+        self._satisfy  = np.zeros((models if series else 0, n), dtype=bool)
+        self._energy   = np.zeros(models)
+        self._fraction = np.zeros(models)
+        self.valid     = np.zeros(n, dtype=np.int64)
+        self.hits      = np.zeros(n, dtype=np.int64)
+        self.total     = np.zeros(n)
+        self.squares   = np.zeros(n)
+        self.minimum   = np.full(n, np.inf)
+        self.maximum   = np.full(n, -np.inf)
+
+    @property
+    def distance(self):
+        """(models x constraints) distances, NaN where not computable"""
+        return self._distance[:self._size]
+
+    @property
+    def satisfied(self):
+        return self._satisfy[:self._size]
+
+    @property
+    def energy(self):
+        """Total HARMONIC energy of each model"""
+        return self._energy[:self._size]
+
+    @property
+    def fraction(self):
+        """Fraction of the computable constraints satisfied by each model"""
+        return self._fraction[:self._size]
+
+    def _reserve(self, models):
+        need = self._size + models
+        if need <= len(self._energy): return
+        capacity = max(need, 2 * len(self._energy), 16)
+        names    = ["_energy", "_fraction"] + (["_distance", "_satisfy"] if self.series else [])
+        for name in names:
+            old   = getattr(self, name)
+            grown = np.zeros((capacity,) + old.shape[1:], dtype=old.dtype)
+            grown[:self._size] = old[:self._size]
+            setattr(self, name, grown)
+
+    def add(self, coords, labels=None):
+        """
+        Add one model or a stack of models (see ConstraintEvaluation for the
+        accepted coordinates).
+        """
+        result = ConstraintEvaluation.compute(self.data, coords, self.first, self.tolerance)
+        dist   = np.atleast_2d(result["distance"])
+        sat    = np.atleast_2d(result["satisfied"])
+        energy = np.atleast_2d(result["energy"])
+        models = dist.shape[0]
+        self._reserve(models)
+        rows = slice(self._size, self._size + models)
+        if self.series:
+            self._distance[rows] = dist
+            self._satisfy[rows]  = sat
+        known = ~np.isnan(dist)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            self._energy[rows]   = np.nansum(energy, axis=1)
+            self._fraction[rows] = sat.sum(axis=1) / known.sum(axis=1).astype(np.float64)
+        zero = np.where(known, dist, 0.0)
+        self.valid   += known.sum(axis=0)
+        self.hits    += sat.sum(axis=0)
+        self.total   += zero.sum(axis=0)
+        self.squares += (zero * zero).sum(axis=0)
+        self.minimum  = np.minimum(self.minimum, np.where(known, dist, np.inf).min(axis=0))
+        self.maximum  = np.maximum(self.maximum, np.where(known, dist, -np.inf).max(axis=0))
+        if labels is None: labels = [str(self._size + i) for i in range(models)]
+        self.labels.extend(labels)
+        self._size += models
+
+    def add_pdb(self, filename):
+        """
+        Add every model of a PDB file (the atoms of the constraints, first
+        chain), reading one model at a time.
+        """
+        from ..structure import PDBReader
+        atoms = set(self.data.labels["atm1"]) | set(self.data.labels["atm2"])
+        chain = None
+        last  = max(int(self.data.num1.max()), int(self.data.num2.max())) if len(self.data) > 0 else 0
+        for m, model in enumerate(PDBReader.iter_models(filename)):
+            if chain is None and len(model) > 0: chain = model.chains()[0]
+            if chain is not None: model = model.select(chain=chain)
+            coords = dict((x, model.dense(x, self.first, last)) for x in atoms)
+            self.add(coords, ["{0}:{1}".format(filename, m + 1)])
+
+    @staticmethod
+    def sources(paths):
+        """PDB files of a list of files, directories and glob patterns, in order"""
+        if isinstance(paths, str): paths = [paths]
+        files = []
+        for x in paths:
+            if os.path.isdir(x):
+                files.extend(sorted(glob.glob(os.path.join(x, "*.pdb"))))
+            elif glob.has_magic(x):
+                files.extend(sorted(glob.glob(x)))
+            else:
+                files.append(x)
+        return files
+
+    def summary(self):
+        """
+        Per-constraint statistics over all the models: valid (models where
+        it could be computed), mean, std, min and max distance and the
+        satisfied fraction.
+        """
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = self.total / self.valid
+            std  = np.sqrt(np.maximum(self.squares / self.valid - mean * mean, 0.0))
+            frac = self.hits / self.valid.astype(np.float64)
+        none = self.valid == 0
+        return {"valid": self.valid, "mean": mean, "std": std,
+                "min": np.where(none, np.nan, self.minimum),
+                "max": np.where(none, np.nan, self.maximum), "satisfied": frac}
+
+    def __len__(self):
+        return self._size
@@ -15,8 +15,10 @@ class Form(object):
     _AA_DIST = 2.2
     _EDGE    = "CC"
 
-    def __init__(self, sslist):
+    def __init__(self, sslist, geometry=None):
         self.sslist    = sslist
+        self.geometry  = geometry
+        self._rows     = geometry.rows(sslist) if geometry is not None else None
         self.sequence  = ""
         self.structure = ""
         self.loops     = []
@@ -31,7 +33,7 @@ class Form(object):
             self.structure += (self.sslist[x].type * self.sslist[x].length)
             self.sequence  += self.sslist[x].sequence
             if x != len(self.sslist) - 1:
-                dist = self.sslist[x].distance(self.sslist[x + 1], up)
+                dist = self._distance(x, up)
                 self.structure += ("C" * int(math.ceil(dist / self._AA_DIST)))
                 self.sequence += ("G" * int(math.ceil(dist / self._AA_DIST)))
                 self.loops.append(int(math.ceil(dist / self._AA_DIST)))
@@ -40,6 +42,15 @@ class Form(object):
         self.sequence  += "G" * len(self._EDGE)
         self.loops.append(len(self._EDGE))
 
+    def _distance(self, x, key):
+        """Distance between the SSEs x and x + 1, from the fabric geometry if any"""
+        if self.geometry is None: return self.sslist[x].distance(self.sslist[x + 1], key)
+        return self.geometry.distance[self._rows[x], self._rows[x + 1], self.geometry.KEYS[key]]
+
+    def _point(self, x, key):
+        if self.geometry is None: return self.sslist[x].get_xyz(key)
+        return self.geometry.point(self._rows[x], key)
+
     def matches_desc(self):
         if not self._expected_edges():        return False
         if not self._expected_directions():   return False
@@ -73,15 +84,14 @@ class Form(object):
         return '\n'.join(text)
 
     def to_file_constraint(self):
-        constraints = ConstraintSet()
         prelength   = 0
         positions   = []
         up          = 1
         for x in range(len(self.sslist)):
             prelength += self.loops[x]
-            ini = (prelength + 1, self.sslist[x].get_xyz(up))
-            mid = (ini[0] - 1 + self.sslist[x].length / 2, self.sslist[x].Mxyz)
-            end = (ini[0] - 1 + self.sslist[x].length, self.sslist[x].get_xyz(up))
+            ini = (prelength + 1, self._point(x, up))
+            mid = (ini[0] - 1 + self.sslist[x].length / 2, self._point(x, 0))
+            end = (ini[0] - 1 + self.sslist[x].length, self._point(x, up))
             prelength = end[0]
             up *= -1
             positions.append([ini, mid, end])
@@ -89,15 +99,13 @@ class Form(object):
 
         positions = self._expand_points(positions)  # EXPAND POINT... to.... manual...
 
-        for x in range(len(positions) - 1):
-            for xx in range(len(positions[x])):
-                xxx = positions[x][xx]
-                for y in range(x + 1, len(positions)):
-                    for yy in range(len(positions[y])):
-                        yyy = positions[y][yy]
-                        d = scsp.distance.cdist([xxx[1]], [yyy[1]], 'euclidean')[0][0]
-                        constraints.add_constraint(xxx[0], yyy[0], d)
-        return str(constraints)
+        # Every point against every point of the later SSEs, in a single cdist
+        nums = np.array([int(p[0]) for x in positions for p in x], dtype=np.int64)
+        xyz  = np.array([p[1] for x in positions for p in x], dtype=np.float64).reshape(-1, 3)
+        sse  = np.repeat(np.arange(len(positions)), [len(x) for x in positions])
+        i, j = np.nonzero(sse[:, None] < sse[None, :])
+        dist = scsp.distance.cdist(xyz, xyz, 'euclidean')[i, j]
+        return str(ConstraintSet.from_arrays(nums[i], nums[j], dist))
 
     def _expand_points(self, positions):
         new_p = []
@@ -134,6 +142,9 @@ class Form(object):
         return True
 
     def _intersection(self, s1, s2, key):
+        if self.geometry is not None:
+            a, b, c, d = self.geometry.rows(tuple(s1) + tuple(s2))
+            return bool(self.geometry.intersection(a, b, c, d, key))
         left   = max(
                     min(s1[0].get_x(key), s1[1].get_x(key)),
                     min(s2[0].get_x(key), s2[1].get_x(key))
@@ -6,11 +6,13 @@
 import os
 import json
 import numpy as np
-import networkx as nx
 
 from .SecondaryStructure import SecondaryStructure as SS
 from .Form import Form
 from .FormMotif import FormMotif
+from .FormPaths import FormPaths
+from .FormGeometry import FormGeometry
+from .FormValidator import FormValidator
 
 
 class FormFabric(object):
@@ -27,8 +29,20 @@ class FormFabric(object):
         self._layers = []
         self._motif  = None
 
-        self.forms     = []
+        self.geometry  = None
+        self._forms    = None
         self.Estandard = 8
+        self.processes = 1
+
+    @property
+    def forms(self):
+        """All the valid Forms, built on first access (see iter_forms)"""
+        if self._forms is None: self._forms = list(self.iter_forms())
+        return self._forms
+
+    @forms.setter
+    def forms(self, value):
+        self._forms = value
 
     def build(self, identifier, filename):
         self._id = identifier
@@ -42,9 +56,14 @@ class FormFabric(object):
         self._process(data)
 
     def dump(self, outdir = os.path.join(os.getcwd(), 'forms')):
+        """
+        Write every Form as it is generated; only one Form is kept in
+        memory unless the forms list was already built.
+        """
         outdir = os.path.join(outdir, self._id)
         if not os.path.isdir(outdir): os.makedirs(outdir)
-        for x in range(len(self.forms)):
+        forms = self._forms if self._forms is not None else self.iter_forms()
+        for x, form in enumerate(forms):
             ident = "{0}_{1:06d}".format(self._id, x + 1)
             finaldir = os.path.join(outdir, ident)
             if not os.path.isdir(finaldir): os.mkdir(finaldir)
@@ -55,14 +74,14 @@ class FormFabric(object):
             targetl = os.path.join(finaldir, "target.loop")
             tmplatl = os.path.join(finaldir, "template.loop")
             comndfl = os.path.join(finaldir, "run.command")
-            with open(identf, "w")  as fd: fd.write(str(self.forms[x]))
-            with open(fasta, "w")   as fd: fd.write(self.forms[x].to_fasta(self._id))
-            with open(psipred, "w") as fd: fd.write(self.forms[x].to_psipred_ss())
-            with open(constrs, "w") as fd: fd.write(self.forms[x].to_file_constraint())
+            with open(identf, "w")  as fd: fd.write(str(form))
+            with open(fasta, "w")   as fd: fd.write(form.to_fasta(self._id))
+            with open(psipred, "w") as fd: fd.write(form.to_psipred_ss())
+            with open(constrs, "w") as fd: fd.write(form.to_file_constraint())
             with open(targetl, "w") as fd: fd.write(self._motif.to_target_loops())
-            with open(tmplatl, "w") as fd: fd.write(self._motif.to_tmpl_loops(self.forms[x]))
+            with open(tmplatl, "w") as fd: fd.write(self._motif.to_tmpl_loops(form))
             if not os.path.isfile(comndfl):
-                with open(comndfl, "w") as fd: fd.write(self._motif.to_command(targetl, tmplatl, fasta, psipred, constrs, ident, self.forms[x], comndfl))
+                with open(comndfl, "w") as fd: fd.write(self._motif.to_command(targetl, tmplatl, fasta, psipred, constrs, ident, form, comndfl))
 
     def print_structures(self):
         for x in self._layers:
@@ -73,7 +92,8 @@ class FormFabric(object):
         self._id     = None
         self._desc   = None
         self._layers = None
-        self.forms   = []
+        self._forms  = None
+        self.geometry = None
 
     def _process(self, description):
         self._desc  = description
@@ -88,40 +108,31 @@ class FormFabric(object):
 
         self._apply_lengths(maxL)
         self._place_xz()
-        self._create_forms()
-
-    def _create_forms( self ):
-        i = 1
-        G = self._create_graph()
-        path_length = len( G.nodes() )-1
-        self.forms = []
-        for node in G.nodes():
-            for path in self._find_paths(G, node, path_length):
-                f = Form(path)
-                if not f.matches_desc(): continue
-                f.make_structure_sequence()
-                self.forms.append(f)
-                i += 1
-
-    def _create_graph( self ):
-        G = nx.Graph()
-        for x in self._layers:
-            for sse1 in x:
-                for sse2 in x:
-                    if sse1 < sse2:
-                        G.add_edge( sse1 , sse2, object=SS )
-        for lyr1 in range(len(self._layers)):
-            for lyr2 in range(len(self._layers)):
-                if abs(lyr1 - lyr2) == 1:  # Only consecutive layers
-                    for sse1 in self._layers[lyr1]:
-                        for sse2 in self._layers[lyr2]:
-                            G.add_edge( sse1 , sse2, object=SS )
-        return G
-
-    def _find_paths( self, G, u, n ):
-        if n == 0: return [[u]]
-        paths = [[u]+path for neighbor in G.neighbors(u) for path in self._find_paths(G, neighbor, n-1) if u not in path]
-        return paths
+        self.geometry = FormGeometry([y for x in self._layers for y in x])
+        self._forms = None
+
+    def iter_forms(self):
+        """
+        Yield the valid Forms one at a time, in the numbering order of
+        dump().  Paths are searched on self.processes processes (None for
+        all the cores); the order does not depend on it.
+        """
+        engine = FormPaths(self._layers, self.geometry)
+        for path in engine.paths(self.processes):
+            f = Form([engine.nodes[x] for x in path], self.geometry)
+            f.make_structure_sequence()
+            yield f
+
+    def iter_candidates(self, paths, block=4096):
+        """
+        Yield a Form for each candidate path (rows of indexes into
+        self.geometry.nodes) that passes FormValidator, in the given order.
+        """
+        paths = np.asarray(paths, dtype=np.int64)
+        for path in paths[FormValidator.validate(self.geometry, paths, block)]:
+            f = Form([self.geometry.nodes[x] for x in path], self.geometry)
+            f.make_structure_sequence()
+            yield f
 
     def _place_xz(self):
         r = np.random.random_sample()
@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+# @Author: Jaume Bonet
+# @Date:   2016-05-04 09:41:12
+# @Last Modified by:   Jaume Bonet
+# @Last Modified time: 2016-05-04 09:41:12
+"""
+Packed coordinates and distances of the secondary structures of a fabric.
+
+Once FormFabric._place_xz has run, the up, middle and down points of the
+secondary structures do not change, so they are stored once as an
+(SSE x 3 x 3) array (up, middle, down; x, y, z) together with the
+(SSE x SSE x 3) distance tensor between equivalent points and the layer, edge
+and direction of each structure.  Every Form of the fabric reads from the same arrays
+instead of asking each SecondaryStructure; the cache has to be rebuilt if
+a length or a position changes.
+
+Keys follow SecondaryStructure.get_xyz: "up"/1, "middle"/0, "down"/-1.
+"""
+import numpy as np
+import scipy.spatial as scsp
+
+
+class FormGeometry(object):
+    """Shared coordinate arrays and distance tensor of a list of SSEs"""
+    KEYS = {"up": 0, 1: 0, "middle": 1, 0: 1, "down": 2, -1: 2}
+
+    def __init__(self, nodes):
+        self.nodes  = list(nodes)
+        self.index  = dict((x, i) for i, x in enumerate(self.nodes))
+        self.layer  = np.array([x.layer for x in self.nodes], dtype=np.int64)
+        self.edge   = np.array([x.edge for x in self.nodes], dtype=np.int64)
+        self.direct = np.array([x.direct for x in self.nodes], dtype=np.int64)
+        n = len(self.nodes)
+        self.xyz = np.zeros((n, 3, 3))
+        for i, x in enumerate(self.nodes):
+            self.xyz[i] = (x.Uxyz, x.Mxyz, x.Dxyz)
+        self.x = self.xyz[:, :, 0]
+        self.z = self.xyz[:, :, 2]
+        self.distance = np.zeros((n, n, 3))
+        for k in range(3):
+            if n > 0: self.distance[:, :, k] = scsp.distance.cdist(self.xyz[:, k], self.xyz[:, k], 'euclidean')
+
+    def rows(self, sslist):
+        """Index of each SecondaryStructure in the arrays"""
+        return [self.index[x] for x in sslist]
+
+    def point(self, node, key):
+        return self.xyz[node, self.KEYS[key]]
+
+    def intersection(self, a, b, c, d, key):
+        """
+        Whether the connection a-b intersects c-d on the key side (as
+        Form._intersection); indexes can be arrays of any broadcastable
+        shape.
+        """
+        k = self.KEYS[key]
+        x = self.x[:, k]
+        z = self.z[:, k]
+        left   = np.maximum(np.minimum(x[a], x[b]), np.minimum(x[c], x[d]))
+        right  = np.minimum(np.maximum(x[a], x[b]), np.maximum(x[c], x[d]))
+        top    = np.maximum(np.minimum(z[a], z[b]), np.minimum(z[c], z[d]))
+        bottom = np.minimum(np.maximum(z[a], z[b]), np.maximum(z[c], z[d]))
+        return (bottom < top) | (right > left)
@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+# @Author: Jaume Bonet
+# @Date:   2016-05-02 10:14:37
+# @Last Modified by:   Jaume Bonet
+# @Last Modified time: 2016-05-02 10:14:37
+"""
+Enumeration of the valid paths through the secondary structures of a fabric.
+
+Secondary structures are numbered in layer order.  Two of them are linked
+when they share a layer or sit in consecutive layers, and a path visits
+all of them once.  Adjacency, visited sets and the connections already used
+are kept as integer bitmasks; the search is an iterative depth-first walk
+that checks the Form.matches_desc() rules as the path grows:
+
+edges        -- the ends cannot be edge -1 structures and structures
+                marked as edge 1 can only be at the ends
+directions   -- structures at even positions share one direction and those
+                at odd positions the opposite one
+intersection -- connections alternate between the up and down sides; two
+                connections of the same side cannot intersect
+                (FormGeometry.intersection on their x/z)
+
+The three rules give the same answer for a path and its reverse, so only
+paths ending on a structure with a higher index than their start are
+searched and each one is reported in both orientations.
+"""
+import multiprocessing
+
+import numpy as np
+
+from .FormGeometry import FormGeometry
+
+_ENGINE = None
+
+
+def _init_worker(engine):
+    global _ENGINE
+    _ENGINE = engine
+
+
+def _paths_worker(job):
+    return list(_ENGINE.canonical(*job))
+
+
+class FormPaths(object):
+    """Rule-pruned Hamiltonian path search over a list of layers"""
+
+    def __init__(self, layers, geometry=None):
+        self.nodes  = [y for x in layers for y in x]
+        layer       = [i for i, x in enumerate(layers) for y in x]
+        n           = len(self.nodes)
+        self.edge   = [x.edge for x in self.nodes]
+        self.direct = [x.direct for x in self.nodes]
+        if sum([1 for x in self.edge if x == 1]) > 2:
+            raise AttributeError("More than two edge structures is not possible")
+
+        # Neighbours listed in the order of the original graph construction
+        self.neighbors = [[] for x in range(n)]
+        self.adjacency = [0] * n
+        pairs = [(i, j) for i in range(n) for j in range(n) if i < j and layer[i] == layer[j]]
+        for a in range(len(layers)):
+            for b in range(len(layers)):
+                if abs(a - b) != 1: continue
+                pairs.extend([(i, j) for i in range(n) for j in range(n) if layer[i] == a and layer[j] == b])
+        for i, j in pairs:
+            if self.adjacency[i] >> j & 1: continue
+            self.neighbors[i].append(j)
+            self.neighbors[j].append(i)
+            self.adjacency[i] |= 1 << j
+            self.adjacency[j] |= 1 << i
+
+        # Connection c = i * n + j; conflicts[c] is the mask of the connections it intersects
+        self.geometry  = geometry if geometry is not None else FormGeometry(self.nodes)
+        self.conflicts = {}
+        links = [(i, j) for i in range(n) for j in self.neighbors[i] if i < j]
+        rows  = self.geometry.rows(self.nodes)
+        ends  = np.array([(rows[i], rows[j]) for i, j in links], dtype=np.int64).reshape(-1, 2)
+        cross = self.geometry.intersection(ends[:, :1], ends[:, 1:], ends[:, 0], ends[:, 1], "up")
+        np.fill_diagonal(cross, False)
+        for (i, j), hits in zip(links, cross):
+            mask = 0
+            for k in np.flatnonzero(hits):
+                mask |= 1 << (links[k][0] * n + links[k][1])
+            self.conflicts[i * n + j] = mask
+            self.conflicts[j * n + i] = mask
+
+    def _connection(self, i, j):
+        n = len(self.nodes)
+        return min(i, j) * n + max(i, j)
+
+    def starts(self):
+        """Nodes a canonical path can start from"""
+        return [i for i in range(len(self.nodes) - 1) if self.edge[i] != -1]
+
+    def canonical(self, start, second=None):
+        """
+        Valid paths from start that end on a higher index node, in search
+        order; with second, only those continuing to that node.
+        """
+        n = len(self.nodes)
+        if n < 2 or self.edge[start] == -1: return
+        above = ((1 << n) - 1) & ~((1 << (start + 1)) - 1)
+
+        path    = [start]
+        visited = 1 << start
+        used    = [0, 0]
+        conns   = []
+        sides   = [self._side(0, start, 0)]
+        iters   = [iter(self.neighbors[start] if second is None else [second])]
+        while iters:
+            nxt = next(iters[-1], None)
+            if nxt is None:
+                iters.pop()
+                last = path.pop()
+                visited &= ~(1 << last)
+                sides.pop()
+                if conns: used[(len(conns) - 1) % 2] &= ~(1 << conns.pop())
+                continue
+            k = len(path)
+            if visited >> nxt & 1: continue
+            if k < n - 1 and self.edge[nxt] == 1: continue
+            if k == n - 1 and (self.edge[nxt] == -1 or nxt < start): continue
+            side = self._side(sides[-1], nxt, k)
+            if side is None: continue
+            conn = self._connection(path[-1], nxt)
+            cls  = (k - 1) % 2
+            if self.conflicts[conn] & used[cls]: continue
+            if k == n - 1:
+                yield tuple(path) + (nxt,)
+                continue
+            if not above & ~(visited | 1 << nxt): continue
+            path.append(nxt)
+            visited |= 1 << nxt
+            used[cls] |= 1 << conn
+            conns.append(conn)
+            sides.append(side)
+            iters.append(iter(self.neighbors[nxt]))
+
+    def _side(self, current, node, position):
+        """
+        Direction expected at even positions after adding node at position
+        (0 while unknown), or None if node breaks the direction rule.
+        """
+        d = self.direct[node]
+        if d == 0: return current
+        expected = d if position % 2 == 0 else -d
+        if current != 0 and current != expected: return None
+        return expected
+
+    def paths(self, processes=1):
+        """
+        Every valid path (tuple of node indexes), each followed by its
+        reverse.  With several processes, the search is split by the first
+        two nodes of the paths and the results are put back in search
+        order, so the output is the same as the serial one.
+        """
+        if processes is None: processes = multiprocessing.cpu_count()
+        jobs = [(x,) for x in self.starts()]
+        if processes > 1:
+            jobs = [(x, y) for x in self.starts() for y in self.neighbors[x]]
+        if processes > 1 and len(jobs) > 1:
+            pool = multiprocessing.Pool(min(processes, len(jobs)), _init_worker, (self,))
+            try:
+                for block in pool.imap(_paths_worker, jobs):
+                    for path in block:
+                        yield path
+                        yield path[::-1]
+            finally:
+                pool.terminate()
+                pool.join()
+            return
+        for job in jobs:
+            for path in self.canonical(*job):
+                yield path
+                yield path[::-1]
@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+# @Author: Jaume Bonet
+# @Date:   2016-05-05 10:22:47
+# @Last Modified by:   Jaume Bonet
+# @Last Modified time: 2016-05-05 10:22:47
+"""
+Batch version of Form.matches_desc() over candidate paths.
+
+Candidates are an (paths x SSE) matrix of indexes into the FormGeometry of
+a fabric, all with the same length.  The edge, direction and intersection
+rules are evaluated for every row at once against the geometry arrays,
+after checking that consecutive structures are linked in the fabric:
+
+links        -- structures in the same or in consecutive layers, as in the
+                graph searched by FormPaths
+edges        -- Form._expected_edges (AttributeError if more than two
+                structures of a path are marked as edge 1)
+directions   -- Form._expected_directions
+intersection -- Form._expected_intersection; connections (i, i + 1) with
+                even i are on the up side, the others on the down side
+
+Intersections are tested as (paths x connections x connections) arrays,
+block rows at a time to bound memory.
+"""
+import numpy as np
+
+
+class FormValidator(object):
+    """Boolean masks of the candidate paths matching the Form rules"""
+
+    @staticmethod
+    def links(geometry, paths):
+        layer = geometry.layer[paths]
+        return np.all(np.abs(np.diff(layer, axis=1)) <= 1, axis=1)
+
+    @staticmethod
+    def edges(geometry, paths):
+        edge  = geometry.edge[paths]
+        count = np.sum(edge == 1, axis=1)
+        if np.any(count > 2): raise AttributeError("More than two edge structures is not possible")
+        ends = edge[:, 0] + edge[:, -1]
+        ok   = (edge[:, 0] != -1) & (edge[:, -1] != -1)
+        return ok & ((count == 0) | (ends == count))
+
+    @staticmethod
+    def directions(geometry, paths):
+        direct = geometry.direct[paths]
+        even   = direct[:, ::2]
+        odd    = direct[:, 1::2]
+        ok  = ~(np.any(even == 1, axis=1) & np.any(even == -1, axis=1))
+        ok &= ~(np.any(odd == 1, axis=1) & np.any(odd == -1, axis=1))
+        ok &= ~(np.any(even == 1, axis=1) & np.any(odd == 1, axis=1))
+        ok &= ~(np.any(even == -1, axis=1) & np.any(odd == -1, axis=1))
+        return ok
+
+    @staticmethod
+    def intersection(geometry, paths, block=4096):
+        ok = np.ones(len(paths), dtype=bool)
+        for side, key in ((0, "up"), (1, "down")):
+            a = paths[:, side:-1:2]
+            b = paths[:, side + 1::2]
+            if a.shape[1] < 2: continue
+            for ini in range(0, len(paths), block):
+                s, e = a[ini:ini + block], b[ini:ini + block]
+                hit  = geometry.intersection(s[:, :, None], e[:, :, None], s[:, None, :], e[:, None, :], key)
+                same = (s[:, :, None] == s[:, None, :]) & (e[:, :, None] == e[:, None, :])
+                ok[ini:ini + block] &= ~np.any(hit & ~same, axis=(1, 2))
+        return ok
+
+    @staticmethod
+    def validate(geometry, paths, block=4096):
+        """Mask of the rows of paths that form valid Forms"""
+        paths = np.asarray(paths, dtype=np.int64)
+        if paths.ndim != 2 or paths.shape[1] == 0: return np.zeros(len(paths), dtype=bool)
+        ok  = FormValidator.links(geometry, paths)
+        ok &= FormValidator.edges(geometry, paths)
+        ok &= FormValidator.directions(geometry, paths)
+        rows = np.flatnonzero(ok)
+        ok[rows] = FormValidator.intersection(geometry, paths[rows], block)
+        return ok
@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+# @Author: Jaume Bonet
+# @Date:   2016-04-15 10:44:19
+# @Last Modified by:   Jaume Bonet
+# @Last Modified time: 2016-04-15 10:44:19
+import os
+import time
+import multiprocessing
+from collections import OrderedDict
+
+from .FragSet import FragSet
+from .FragmentArray import FragmentArray
+
+
+def _load_worker(job):
+    """Parse one file in a worker process and send back only its arrays"""
+    fragfile, engine, cache = job
+    start = time.time()
+    fset  = FragSet.parse(fragfile, engine=engine, cache=cache)
+    return fragfile, fset.data.arrays(), time.time() - start
+
+
+class FragLibrary(object):
+    """Set of FragSets, keyed by title, loaded in parallel"""
+    def __init__(self):
+        self.fragsets = OrderedDict()
+        self.timings  = OrderedDict()
+        self.walltime = 0.0
+
+    @staticmethod
+    def load(fragfiles, processes=None, engine="fast", cache=None):
+        """
+        Parse many fragment files on a process pool (all cores by default,
+        serially if processes=1).  FragSets are keyed by title, or by the
+        given path when several files share the same name.
+        """
+        start  = time.time()
+        titles = [os.path.split(x)[-1] for x in fragfiles]
+        if len(set(titles)) != len(titles): titles = list(fragfiles)
+        keys   = dict(zip(fragfiles, titles))
+        jobs   = [(x, engine, cache) for x in fragfiles]
+
+        if processes is None: processes = multiprocessing.cpu_count()
+        processes = min(processes, len(jobs))
+        results   = {}
+        if processes <= 1:
+            for job in jobs:
+                fragfile, arrays, seconds = _load_worker(job)
+                results[fragfile] = (arrays, seconds)
+        else:
+            pool = multiprocessing.Pool(processes)
+            try:
+                for fragfile, arrays, seconds in pool.imap_unordered(_load_worker, jobs):
+                    results[fragfile] = (arrays, seconds)
+            finally:
+                pool.close()
+                pool.join()
+
+        library = FragLibrary()
+        for fragfile in fragfiles:
+            arrays, seconds = results[fragfile]
+            fset       = FragSet()
+            fset.data  = FragmentArray.from_arrays(arrays)
+            fset.title = keys[fragfile]
+            library.fragsets[fset.title] = fset
+            library.timings[fset.title]  = seconds
+        library.walltime = time.time() - start
+        return library
+
+    def report(self):
+        """Per-file parsing times as text"""
+        text = []
+        for title, seconds in self.timings.items():
+            text.append("{0:<50} {1:>10.3f}s".format(title, seconds))
+        text.append("{0:<50} {1:>10.3f}s".format("TOTAL (wall)", self.walltime))
+        return "\n".join(text)
+
+    def __getitem__(self, key):
+        return self.fragsets[key]
+
+    def __iter__(self):
+        return self.fragsets.__iter__()
+
+    def __len__(self):
+        return len(self.fragsets)
@@ -3,24 +3,113 @@
 # @Date:   2016-03-15 15:54:35
 # @Last Modified by:   Jaume Bonet
 # @Last Modified time: 2016-03-17 15:19:15
+import io
 import os
 import re
-from collections import Counter
+import gzip
+
+import numpy as np
 
 from .Fragment import Fragment, FragmentPosition
+from .FragmentArray import FragmentArray
+from .FragmentParser import FragmentParser
+from .FragmentIndex import FragmentIndex
+from .FragmentCache import FragmentCache
+from .FragmentWriter import FragmentWriter
+from .FragmentCluster import FragmentCluster
+from .FragmentTree import FragmentTree
+from .FragmentBackbone import FragmentBackbone
+from .FragmentQuality import FragmentQuality
 
 
 class FragSet(object):
     """Set of Fragments for multiple positions"""
     def __init__(self):
-        self.title     = "Fragments"
-        self.fragments = {}
+        self.title = "Fragments"
+        self.data  = FragmentArray()
+
+    @property
+    def fragments(self):
+        return dict((int(x), self.data.position(int(x))) for x in self.data.positions)
 
     @staticmethod
-    def parse(fragfile):
+    def parse(fragfile, engine="python", lazy=False, sidecar=False, cache=None):
+        """
+        Read a Rosetta fragment file.  engine="fast" uses the vectorized
+        FragmentParser, which gives the same FragSet as the line by line
+        "python" engine.
+
+        With lazy=True only the byte offsets of the position blocks are read
+        (from the <fragfile>.idx sidecar if sidecar=True) and each position
+        is parsed when first accessed.
+
+        cache=True keeps a binary copy of the parsed file in
+        <fragfile>.fcache, and a string stores it in that directory instead.
+        A valid cache is memory-mapped instead of parsing the file; a stale
+        one is rebuilt.
+        """
+        if cache:
+            store = FragmentCache(fragfile, None if cache is True else cache)
+            fset  = FragSet()
+            fset.data = store.load()
+            if fset.data is None:
+                fset.data = FragSet.parse(fragfile, engine).data
+                store.save(fset.data)
+            fset.title = os.path.split(fragfile)[-1]
+            return fset
+        if lazy:
+            fset       = FragSet()
+            fset.data  = FragmentIndex.open(fragfile, sidecar)
+            fset.title = os.path.split(fragfile)[-1]
+            return fset
+        if engine == "fast":
+            fset       = FragSet()
+            fset.data  = FragmentArray.from_columns(FragmentParser.parse(fragfile))
+            fset.title = os.path.split(fragfile)[-1]
+            return fset
+        if engine != "python":
+            raise ValueError("Unknown fragment parsing engine: {0}".format(engine))
+
         fset    = FragSet()
-        ppos    = FragmentPosition()
-        re_pnum = re.compile("position:\s+(\d+)")
+        columns = dict((x, []) for x in FragmentArray.COLUMNS)
+        for posenum, fpos in FragSet._read_lines(fragfile):
+            for x in FragmentArray.COLUMNS:
+                columns[x].append(getattr(fpos, x))
+        fset.data  = FragmentArray.from_columns(columns)
+        fset.title = os.path.split(fragfile)[-1]
+        return fset
+
+    @staticmethod
+    def iter_parse(fragfile):
+        """
+        Yield (posenum, [Fragment, ...]) for each position block of a
+        fragment file, keeping a single block in memory.  Fragments are
+        split exactly as in FragSet.parse; the posenum is the one of the
+        'position:' header of the block.
+        """
+        posenum   = None
+        fragments = []
+        ppos      = None
+        for block, fpos in FragSet._read_lines(fragfile):
+            if block != posenum:
+                if len(fragments) > 0: yield posenum, fragments
+                posenum   = block
+                fragments = []
+                ppos      = None
+            if ppos is None or fpos.fragnum != ppos.fragnum or fpos.posenum != ppos.posenum:
+                fragments.append(Fragment())
+            fragments[-1].append(fpos)
+            ppos = fpos
+        if len(fragments) > 0: yield posenum, fragments
+
+    @staticmethod
+    def _read_lines(fragfile):
+        """
+        Yield (header posenum, FragmentPosition) for each fragment line,
+        filling missing position and fragment numbers from the last header
+        and the count of blank lines after it.
+        """
+        re_pnum = re.compile("\s*position:\s+(\d+)")
         posenum = 0
         fragnum = 0
         with open(fragfile) as fd:
@@ -37,55 +126,171 @@ class FragSet(object):
                 fpos = FragmentPosition.parse(line)
                 if fpos.posenum == 0: fpos.posenum = posenum
                 if fpos.fragnum == 0: fpos.fragnum = fragnum
-                fset.fragments.setdefault(fpos.posenum, [])
-                if fpos.fragnum != ppos.fragnum:
-                    fset.fragments[fpos.posenum].append(Fragment())
-                fset.fragments[fpos.posenum][-1].append(fpos)
-                ppos = fpos
-        fset.title = os.path.split(fragfile)[-1]
-        return fset
+                yield posenum, fpos
 
     def candidates(self):
-        return len(self.fragments[1])
+        return len(self[1])
 
     def min_position(self):
-        return min(self.fragments.keys())
+        return int(min(self.data.positions))
 
     def max_position(self):
-        return max(self.fragments.keys())
+        return int(max(self.data.positions))
+
+    def profile(self):
+        """
+        Per-residue summary of the fragments, computed over all the rows at
+        once.  Residue r gathers the z-th residue of every fragment of the
+        position p such that p + z == r.  Returns a dict of arrays with one
+        item per residue, from min_position() to the last covered residue:
+
+        residue       -- residue number
+        coverage      -- number of fragment residues covering it
+        offsets       -- values of the i-th residue are phi[offsets[i]:offsets[i + 1]]
+        phi, psi      -- torsions grouped by residue and sorted within each
+        phi_box       -- lower whisker, first quartile, median, third
+        psi_box          quartile and upper whisker (1.5 IQR, as matplotlib)
+        secstr        -- consensus secondary structure (ties go to the first seen)
+        secstr_freq   -- fraction of the coverage agreeing with the consensus
+        aatype        -- consensus amino acid
+        aatype_freq   -- fraction of the coverage agreeing with the consensus
+        """
+        data   = self._array()
+        first  = self.min_position()
+        resid  = data.residue_number() - first
+        nres   = int(resid.max()) + 1 if len(resid) > 0 else 0
+        cover  = np.bincount(resid, minlength=nres)
+        offset = np.zeros(nres + 1, dtype=np.int64)
+        np.cumsum(cover, out=offset[1:])
+
+        prof = {"residue": np.arange(first, first + nres), "coverage": cover,
+                "offsets": offset}
+        for name in ("phi", "psi"):
+            values = getattr(data, name)
+            values = values[np.lexsort((values, resid))]
+            prof[name] = values
+            prof[name + "_box"] = FragSet._box(values, offset)
+        for name in ("secstr", "aatype"):
+            cons, freq = FragSet._consensus(getattr(data, name), resid, cover)
+            prof[name] = cons
+            prof[name + "_freq"] = freq
+        return prof
+
+    def cluster(self, count=None, threshold=None, processes=1):
+        """
+        Group the fragments of each position by backbone torsions (RMS
+        angular distance in degrees, see FragmentCluster).  Keeps up to
+        count representatives per position, or as many as needed for every
+        fragment to be within threshold of one.  Returns a dictionary of
+        position to (representatives, labels) with the indexes of the
+        fragments in fset[pos].
+        """
+        return FragmentCluster.cluster(self._array(), count, threshold, processes)
+
+    def prune(self, count=None, threshold=None, processes=1):
+        """New FragSet with only the representatives found by cluster()"""
+        data      = self._array()
+        clusters  = FragmentCluster.cluster(data, count, threshold, processes)
+        fragments = [data.posptr[data._posidx[pos]] + reps
+                     for pos, (reps, labels) in clusters.items()]
+        fset       = FragSet()
+        fset.data  = data.subset(np.concatenate(fragments) if fragments else [])
+        fset.title = self.title
+        return fset
+
+    def tree(self, length=None):
+        """Torsion-space nearest-neighbour index of the fragments (see FragmentTree)"""
+        return FragmentTree.build(self, length)
+
+    def backbone(self, pos):
+        """(fragments x length x 3 x 3) ideal N/CA/C of the fragments of a position"""
+        return FragmentBackbone.build(self._array().torsions(pos))
+
+    def rmsd(self, pos):
+        """Pairwise CA RMSD, after superposition, of the fragments of a position"""
+        return FragmentBackbone.rmsd(self.backbone(pos)[:, :, 1, :])
+
+    def quality(self, reference, secstr=None, threshold=30.0):
+        """
+        Per-position quality against a reference backbone (see FragmentQuality).
+        reference is a (residues x 2|3) phi/psi[/omega] array, a file with
+        that table or a secondary structure string (H/E/C), which is also
+        used for secondary structure agreement unless secstr is given.
+        Returns a structured array with position, fragments, best, median,
+        good (fraction under threshold) and ss_agreement.
+        """
+        if isinstance(reference, str) and os.path.isfile(reference):
+            reference = FragmentQuality.read(reference)
+        elif isinstance(reference, str):
+            if secstr is None: secstr = reference
+            reference = FragmentQuality.from_secstr(reference)
+        return FragmentQuality.compute(self._array(), reference, secstr, threshold)
+
+    def write_quality(self, quality, output):
+        """Write a quality() table as tab-separated text"""
+        with open(output, "w") as fd:
+            fd.write(FragmentQuality.to_text(quality))
+
+    @staticmethod
+    def _box(values, offsets):
+        """Box plot statistics of values sorted within consecutive groups"""
+        n     = np.diff(offsets)
+        box   = np.full((len(n), 5), np.nan)
+        has   = n > 0
+        if not np.any(has): return box
+        ini   = offsets[:-1][has]
+        size  = n[has]
+        quart = []
+        for q in (0.25, 0.5, 0.75):
+            pos  = q * (size - 1)
+            lo   = np.floor(pos).astype(np.int64)
+            hi   = np.minimum(lo + 1, size - 1)
+            a, b = values[ini + lo], values[ini + hi]
+            quart.append(a + (pos - lo) * (b - a))
+        q1, med, q3 = quart
+        iqr   = q3 - q1
+        group = np.repeat(np.arange(len(size)), size)
+        upper = np.where(values <= (q3 + 1.5 * iqr)[group], values, -np.inf)
+        lower = np.where(values >= (q1 - 1.5 * iqr)[group], values, np.inf)
+        whishi = np.maximum(np.maximum.reduceat(upper, ini), q3)
+        whislo = np.minimum(np.minimum.reduceat(lower, ini), q1)
+        box[has] = np.column_stack((whislo, q1, med, q3, whishi))
+        return box
+
+    @staticmethod
+    def _consensus(values, resid, cover):
+        """Most common one-letter code per residue and its frequency"""
+        nres = len(cover)
+        cons = np.zeros(nres, dtype="S1")
+        freq = np.zeros(nres)
+        if len(values) > 0:
+            key = resid.astype(np.int64) * 256 + values.view(np.uint8)
+            uniq, first, count = np.unique(key, return_index=True, return_counts=True)
+            res   = uniq // 256
+            order = np.lexsort((first, -count, res))
+            best  = order[np.append(True, res[order][1:] != res[order][:-1])]
+            cons[res[best]] = (uniq[best] % 256).astype(np.uint8).view("S1")
+            freq[res[best]] = count[best] / cover[res[best]].astype(np.float64)
+        return cons.astype(str), freq
 
     def plot(self, fileprefix = None, format = "svg", to_file = True, show = True):
+        """
+        Phi and psi box plots per residue, drawn from the precomputed box
+        statistics of profile().  The figure is closed unless shown.
+        """
         try:
-            import seaborn as sns
             import matplotlib.pyplot as plt
         except:
-            raise ImportError("Plotting fragments requires seaborn and matplotlib.")
+            raise ImportError("Plotting fragments requires matplotlib.")
 
-        phi = [[] for i in range(self.max_position() + 1)]
-        psi = [[] for i in range(self.max_position() + 1)]
-        sse = [[] for i in range(self.max_position() + 1)]
-        seq = [[] for i in range(self.max_position() + 1)]
-        for x in range(self.min_position(), self.max_position() + 1):
-            for y in range(len(self[x])):
-                for z in range(len(self[x][y])):
-                    if (x + z) >= len(phi):
-                        phi.append([])
-                        psi.append([])
-                        sse.append([])
-                        seq.append([])
-                    phi[x + z].append(self[x][y][z].phi)
-                    psi[x + z].append(self[x][y][z].psi)
-                    sse[x + z].append(self[x][y][z].secstr)
-                    seq[x + z].append(self[x][y][z].aatype)
-        for x in range(len(sse)):
-            if len(sse[x]) == 0: sse[x] = ""
-            else:
-                data   = Counter(sse[x])
-                sse[x] = data.most_common()[0][0]
-            if len(seq[x]) == 0: seq[x] = ""
-            else:
-                data   = Counter(seq[x])
-                seq[x] = data.most_common()[0][0]
+        prof  = self.profile()
+        first = int(prof["residue"][0])
+        nres  = int(prof["residue"][-1]) + 1
+        sse   = ["" for i in range(nres)]
+        seq   = ["" for i in range(nres)]
+        sse[first:] = list(prof["secstr"])
+        seq[first:] = list(prof["aatype"])
+        color = {"H": "b", "E": "r"}
 
         fig = plt.figure()
         fig.suptitle(self.title)
@@ -97,28 +302,21 @@ class FragSet(object):
         ax1.set_xlim([-360, 360])
         ax1.set_ylabel('phi')
         ax1.set_ylim([-360, 360])
-        axs1 = sns.boxplot(data=phi, ax=ax1)
-        ax1.set_xticklabels(sse)
-
-        boxes = axs1.artists
-        for i, box in enumerate(boxes):
-            if 'H' in sse[i+1]:   box.set_facecolor('b')
-            elif 'E' in sse[i+1]: box.set_facecolor('r')
-            else:                 box.set_facecolor('#98FB98')
-
         ax2 = fig.add_subplot(2, 1, 2)
         ax2.xaxis.set_label_position('top')
         ax2.set_ylabel('psi')
         ax2.set_ylim([-360, 360])
-        axs2 = sns.boxplot(data=psi, ax=ax2)
-        ax2.xaxis.set_ticks_position('top')
-        ax2.set_xticklabels(seq)
 
-        boxes = axs2.artists
-        for i, box in enumerate(boxes):
-            if 'H' in sse[i+1]:   box.set_facecolor('b')
-            elif 'E' in sse[i+1]: box.set_facecolor('r')
-            else:                 box.set_facecolor('#98FB98')
+        has    = prof["coverage"] > 0
+        colors = [color.get(sse[i], '#98FB98') for i in np.flatnonzero(has) + first]
+        for ax, name, labels in ((ax1, "phi", sse), (ax2, "psi", seq)):
+            FragSet._boxplot(ax, np.flatnonzero(has) + first, prof[name + "_box"][has],
+                             FragSet._fliers(prof[name], prof["offsets"], prof[name + "_box"], first),
+                             colors)
+            ax.set_xlim([-0.5, nres - 0.5])
+            ax.set_xticks(range(nres))
+            ax.set_xticklabels(labels)
+        ax2.xaxis.set_ticks_position('top')
 
         if to_file:
             filename = ""
@@ -127,23 +325,82 @@ class FragSet(object):
             fig.savefig(filename, dpi=300)
 
         if show: plt.show()
+        else:    plt.close(fig)
+
+    @staticmethod
+    def _fliers(values, offsets, box, first):
+        """Residue and value of the points outside the whiskers of each group"""
+        group = np.repeat(np.arange(len(box)), np.diff(offsets))
+        out   = (values < box[group, 0]) | (values > box[group, 4])
+        return group[out] + first, values[out]
+
+    @staticmethod
+    def _boxplot(ax, x, box, fliers, colors, width=0.8):
+        """
+        Box plot from (n x 5) whislo/q1/med/q3/whishi rows, drawn as a few
+        collections instead of one set of artists per box.
+        """
+        from matplotlib.collections import LineCollection, PolyCollection
+
+        lo, hi = x - width / 2.0, x + width / 2.0
+        cap    = width / 4.0
+        body   = np.stack((np.column_stack((lo, box[:, 1])), np.column_stack((hi, box[:, 1])),
+                           np.column_stack((hi, box[:, 3])), np.column_stack((lo, box[:, 3]))), axis=1)
+        ax.add_collection(PolyCollection(body, facecolors=colors, edgecolors="0.25", zorder=2))
+        segments = []
+        for y0, y1, w in ((1, 0, 0), (3, 4, 0), (0, 0, cap), (4, 4, cap), (2, 2, width / 2.0)):
+            segments.append(np.stack((np.column_stack((x - w, box[:, y0])),
+                                      np.column_stack((x + w, box[:, y1]))), axis=1))
+        ax.add_collection(LineCollection(np.concatenate(segments[:4]), colors="0.25", zorder=1))
+        ax.add_collection(LineCollection(segments[4], colors="0.25", zorder=3))
+        ax.plot(fliers[0], fliers[1], "d", color="0.25", markersize=3, linestyle="none")
+
+    def close(self):
+        """Release the file mapped by a lazy FragSet"""
+        if isinstance(self.data, FragmentIndex): self.data.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
 
     def __getitem__(self, key):
-        return self.fragments[key]
+        if not self.data.has_position(key): raise KeyError(key)
+        return self.data.position(key)
 
     def __iter__(self):
         for x in range(self.min_position(), self.max_position() + 1):
-            yield self.fragments[x]
+            yield self[x]
 
     def __len__(self):
-        return len(self.fragments)
+        return len(self.data.positions)
 
-    def __str__(self):
-        text = []
+    def _array(self):
+        """Whole FragmentArray, parsing every position of a lazy FragSet"""
+        if isinstance(self.data, FragmentIndex): return self.data.array()
+        return self.data
+
+    def write(self, output):
+        """
+        Write the fragments in Rosetta format to a file name or an open
+        file, streaming one position at a time.  The text is identical to
+        str(fset); file names ending in .gz are gzip compressed.
+        """
+        if isinstance(output, str):
+            opener = gzip.open if output.endswith(".gz") else open
+            with opener(output, "wb") as fd:
+                self.write(fd)
+            return
+        binary = not isinstance(output, io.TextIOBase)
+        for text in self._chunks():
+            output.write(text.encode("ascii") if binary else text)
+
+    def _chunks(self):
         for x in range(self.min_position(), self.max_position() + 1):
-            text.append(" position:{0:>13} neighbors:{1:>13}\n".format(x, len(self[x])))
-            for y in self[x]:
-                text.append(str(y))
-                text.append("")
-        text.pop()
-        return "\n".join(text)
+            array, ini, end = self[x].span()
+            text = FragmentWriter.header(x, end - ini) + "\n" + FragmentWriter.format(array, ini, end)
+            yield text if x == self.min_position() else "\n\n" + text
+
+    def __str__(self):
+        return "".join(self._chunks())
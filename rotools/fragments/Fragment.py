@@ -110,3 +110,112 @@ class Fragment(object):
 
     def __str__(self):
         return "\n".join([str(x) for x in self.positions])
+
+
+def _text(value):
+    """Byte codes from the columnar storage are returned as plain strings"""
+    return value if isinstance(value, str) else value.decode("ascii")
+
+
+def _column(name, text=False):
+    def getter(self):
+        value = getattr(self._array, name)[self._row]
+        return _text(value) if text else value.item()
+    return property(getter)
+
+
+class FragmentPositionView(FragmentPosition):
+    """Read-only FragmentPosition over a row of a FragmentArray"""
+    def __init__(self, array, row):
+        self._array = array
+        self._row   = row
+
+    chain   = _column("chain", True)
+    resnum  = _column("resnum")
+    aatype  = _column("aatype", True)
+    secstr  = _column("secstr", True)
+    phi     = _column("phi")
+    psi     = _column("psi")
+    omega   = _column("omega")
+    p       = _column("p", True)
+    posenum = _column("posenum")
+    f       = _column("f", True)
+    fragnum = _column("fragnum")
+
+    @property
+    def pdb(self):
+        return _text(self._array.pdbs[self._array.pdb[self._row]])
+
+    @property
+    def coord(self):
+        xyz = self._array.coord[self._row]
+        if xyz[0] != xyz[0]: return [None, None, None]
+        return [float(x) for x in xyz]
+
+    @property
+    def ukn1(self):
+        return _text(self._array.ukn1[self._row]) or None
+
+    @property
+    def ukn2(self):
+        return _text(self._array.ukn2[self._row]) or None
+
+
+class FragmentView(Fragment):
+    """Read-only Fragment over a row range of a FragmentArray"""
+    def __init__(self, array, index):
+        self._array = array
+        self._ini   = int(array.fragptr[index])
+        self._end   = int(array.fragptr[index + 1])
+
+    @property
+    def positions(self):
+        return [FragmentPositionView(self._array, x) for x in range(self._ini, self._end)]
+
+    def append(self, position):
+        raise TypeError("Fragments stored in a FragmentArray are read-only")
+
+    def __iter__(self):
+        for x in range(self._ini, self._end):
+            yield FragmentPositionView(self._array, x)
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return [FragmentPositionView(self._array, self._ini + x)
+                    for x in range(*key.indices(len(self)))]
+        if key < 0: key += len(self)
+        if key < 0 or key >= len(self): raise IndexError("fragment index out of range")
+        return FragmentPositionView(self._array, self._ini + key)
+
+    def __len__(self):
+        return self._end - self._ini
+
+    def __str__(self):
+        return "\n".join([str(x) for x in self._array.records(self._ini, self._end)])
+
+
+class FragmentListView(object):
+    """Read-only list of the Fragments of one position of a FragmentArray"""
+    def __init__(self, array, index):
+        self._array = array
+        self._ini   = int(array.posptr[index])
+        self._end   = int(array.posptr[index + 1])
+
+    def __iter__(self):
+        for x in range(self._ini, self._end):
+            yield FragmentView(self._array, x)
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return [FragmentView(self._array, self._ini + x)
+                    for x in range(*key.indices(len(self)))]
+        if key < 0: key += len(self)
+        if key < 0 or key >= len(self): raise IndexError("fragment list index out of range")
+        return FragmentView(self._array, self._ini + key)
+
+    def span(self):
+        """FragmentArray and range of fragment indexes under the view"""
+        return self._array, self._ini, self._end
+
+    def __len__(self):
+        return self._end - self._ini
@@ -0,0 +1,198 @@
+# -*- coding: utf-8 -*-
+# @Author: Jaume Bonet
+# @Date:   2016-04-11 10:12:37
+# @Last Modified by:   Jaume Bonet
+# @Last Modified time: 2016-04-11 10:12:37
+"""
+Columnar (struct-of-arrays) storage for Rosetta fragment data.
+
+Each row of the arrays is one FragmentPosition.  Rows of a Fragment are
+contiguous, and so are the Fragments of a position, which lets both levels
+be described with offset arrays:
+
+fragptr[i]:fragptr[i + 1] -- rows of the i-th fragment
+posptr[j]:posptr[j + 1]   -- fragments of the position positions[j]
+
+PDB codes are stored as indexes into pdbs; one letter columns and the
+unused fields are stored as byte strings.  Missing C-alpha coordinates
+are NaN.
+"""
+import numpy as np
+
+from .Fragment import FragmentPosition
+from .Fragment import FragmentPositionView, FragmentView, FragmentListView
+
+
+class FragmentArray(object):
+    """Columnar storage of a set of Fragments"""
+    _DTYPES = {"pdb": np.int32, "chain": "S1", "resnum": np.int32,
+               "aatype": "S1", "secstr": "S1", "phi": np.float64,
+               "psi": np.float64, "omega": np.float64, "coord": np.float64,
+               "ukn1": "S6", "ukn2": "S6", "p": "S1", "posenum": np.int32,
+               "f": "S1", "fragnum": np.int32}
+    COLUMNS = ("pdb", "chain", "resnum", "aatype", "secstr", "phi", "psi",
+               "omega", "coord", "ukn1", "ukn2", "p", "posenum", "f",
+               "fragnum")
+    ARRAYS  = COLUMNS + ("pdbs", "fragptr", "posptr", "positions")
+
+    def __init__(self):
+        self.pdbs = np.zeros(0, dtype="S4")
+        for c in self.COLUMNS:
+            shape = (0, 3) if c == "coord" else 0
+            setattr(self, c, np.zeros(shape, dtype=self._DTYPES[c]))
+        self.fragptr   = np.zeros(1, dtype=np.int64)
+        self.posptr    = np.zeros(1, dtype=np.int64)
+        self.positions = np.zeros(0, dtype=np.int32)
+        self._posidx   = {}
+
+    @staticmethod
+    def from_columns(columns):
+        """
+        Build the storage from a dictionary of column lists or arrays (one
+        value per row, in file order).  'pdb' holds the PDB codes as
+        strings, 'coord' the [x, y, z] values and None or an empty string
+        stands for empty text fields.
+        """
+        data = FragmentArray()
+        data.pdbs, codes = np.unique(np.array(columns["pdb"], dtype="S4"),
+                                     return_inverse=True)
+        data.pdb = codes.astype(np.int32)
+        for c in data.COLUMNS[1:]:
+            values = columns[c]
+            if data._DTYPES[c] in ("S1", "S6") and isinstance(values, list):
+                values = ["" if x is None else x for x in values]
+            setattr(data, c, np.array(values, dtype=data._DTYPES[c]))
+        data.coord = data.coord.reshape(-1, 3)
+        data._group()
+        return data
+
+    @staticmethod
+    def from_arrays(arrays):
+        """Rebuild the storage from the output of arrays()"""
+        data = FragmentArray()
+        for name in data.ARRAYS:
+            setattr(data, name, arrays[name])
+        data._posidx = dict((int(p), i) for i, p in enumerate(data.positions))
+        return data
+
+    def arrays(self):
+        """All the arrays of the storage by name"""
+        return dict((name, getattr(self, name)) for name in self.ARRAYS)
+
+    def _group(self):
+        """
+        A new Fragment starts whenever the fragment or the position number
+        changes.  Fragments are stably sorted by position so that each
+        position ends up as a contiguous block.
+        """
+        n = len(self.posenum)
+        if n == 0:
+            self.fragptr   = np.zeros(1, dtype=np.int64)
+            self.posptr    = np.zeros(1, dtype=np.int64)
+            self.positions = np.zeros(0, dtype=np.int32)
+            self._posidx   = {}
+            return
+        new = np.ones(n, dtype=bool)
+        new[1:] = ((self.fragnum[1:] != self.fragnum[:-1]) |
+                   (self.posenum[1:] != self.posenum[:-1]))
+        starts  = np.flatnonzero(new)
+        lengths = np.diff(np.append(starts, n))
+        fragpos = self.posenum[starts]
+
+        order = np.argsort(fragpos, kind="mergesort")
+        if np.any(order != np.arange(len(order))):
+            starts, lengths, fragpos = starts[order], lengths[order], fragpos[order]
+            newini = np.cumsum(lengths) - lengths
+            self._take(np.repeat(starts - newini, lengths) + np.arange(n))
+        self._index(lengths, fragpos)
+
+    def _index(self, lengths, fragpos):
+        """Offset arrays from the length and position of each fragment"""
+        self.fragptr = np.zeros(len(lengths) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=self.fragptr[1:])
+        self.positions, first = np.unique(fragpos, return_index=True)
+        self.posptr  = np.append(first, len(lengths)).astype(np.int64)
+        self._posidx = dict((int(p), i) for i, p in enumerate(self.positions))
+
+    def _take(self, rows):
+        for c in self.COLUMNS:
+            setattr(self, c, getattr(self, c)[rows])
+
+    def subset(self, fragments):
+        """New FragmentArray with only the given fragment indexes"""
+        fragments = np.unique(np.asarray(fragments, dtype=np.int64))
+        lengths   = np.diff(self.fragptr)[fragments]
+        fragpos   = np.repeat(self.positions, np.diff(self.posptr))[fragments]
+        newini    = np.cumsum(lengths) - lengths
+        data      = FragmentArray()
+        data.pdbs = self.pdbs
+        for c in self.COLUMNS:
+            setattr(data, c, getattr(self, c))
+        data._take(np.repeat(self.fragptr[fragments] - newini, lengths) + np.arange(int(np.sum(lengths))))
+        data._index(lengths, fragpos)
+        return data
+
+    def torsions(self, pos):
+        """
+        (fragments x length x 3) phi/psi/omega of the fragments of a
+        position, cut to the length of its shortest fragment.
+        """
+        j      = self._posidx[pos]
+        ptr    = self.fragptr[self.posptr[j]:self.posptr[j + 1] + 1]
+        length = int(np.min(np.diff(ptr)))
+        rows   = ptr[:-1, None] + np.arange(length)
+        return np.stack((self.phi[rows], self.psi[rows], self.omega[rows]), axis=2)
+
+    def has_position(self, pos):
+        return pos in self._posidx
+
+    def position(self, pos):
+        """List of Fragments of a position as a read-only view"""
+        return FragmentListView(self, self._posidx[pos])
+
+    def fragment(self, index):
+        return FragmentView(self, index)
+
+    def row(self, index):
+        return FragmentPositionView(self, index)
+
+    def records(self, ini, end):
+        """Rows ini:end materialized as independent FragmentPosition"""
+        values = {}
+        for c in self.COLUMNS:
+            values[c] = getattr(self, c)[ini:end].tolist()
+        values["pdb"] = self.pdbs[self.pdb[ini:end]].tolist()
+        records = []
+        for x in range(end - ini):
+            fpos = FragmentPosition()
+            for c in self.COLUMNS:
+                v = values[c][x]
+                if isinstance(v, bytes) and not isinstance(v, str):
+                    v = v.decode("ascii")
+                setattr(fpos, c, v)
+            if fpos.coord[0] != fpos.coord[0]: fpos.coord = [None, None, None]
+            fpos.ukn1 = fpos.ukn1 or None
+            fpos.ukn2 = fpos.ukn2 or None
+            records.append(fpos)
+        return records
+
+    def fragment_index(self):
+        """Index of the fragment of every row"""
+        return np.repeat(np.arange(self.n_fragments()), np.diff(self.fragptr))
+
+    def residue_number(self):
+        """Residue covered by every row: its fragment position plus its offset"""
+        frag = self.fragment_index()
+        fpos = np.repeat(self.positions, np.diff(self.posptr))
+        return fpos[frag] + (np.arange(len(self)) - self.fragptr[frag])
+
+    def n_fragments(self):
+        return len(self.fragptr) - 1
+
+    @property
+    def nbytes(self):
+        """Memory used by the arrays, in bytes"""
+        return sum([x.nbytes for x in self.arrays().values()])
+
+    def __len__(self):
+        return len(self.posenum)
@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+# @Author: Jaume Bonet
+# @Date:   2016-04-21 10:26:15
+# @Last Modified by:   Jaume Bonet
+# @Last Modified time: 2016-04-21 10:26:15
+"""
+Backbone coordinates from fragment torsions.
+
+Backbones are built with the Natural Extension Reference Frame (NeRF)
+method on ideal bond lengths and angles (Engh & Huber).  Each atom is placed
+from the three previous ones, for all the fragments at once:
+
+N(i+1)  -- from N(i), CA(i), C(i) and psi(i)
+CA(i+1) -- from CA(i), C(i), N(i+1) and omega(i)
+C(i+1)  -- from C(i), N(i+1), CA(i+1) and phi(i+1)
+
+The first residue is set on a fixed frame, so backbones are comparable only
+after superposition; rmsd() does so with the Kabsch algorithm on all the
+pairs of a batch.
+"""
+import numpy as np
+
+
+class FragmentBackbone(object):
+    """Batched NeRF backbone builder and CA superposition"""
+    _N_CA    = 1.458
+    _CA_C    = 1.525
+    _C_N     = 1.329
+    _N_CA_C  = np.radians(111.2)
+    _CA_C_N  = np.radians(116.2)
+    _C_N_CA  = np.radians(121.7)
+
+    @staticmethod
+    def place(a, b, c, bond, angle, torsion):
+        """
+        Position of the atom d bonded to c such that |cd| = bond, the b-c-d
+        angle is angle and the a-b-c-d dihedral is torsion (radians).
+        """
+        bc = c - b
+        bc = bc / np.linalg.norm(bc, axis=-1)[..., None]
+        n  = np.cross(b - a, bc)
+        n  = n / np.linalg.norm(n, axis=-1)[..., None]
+        m  = np.cross(n, bc)
+        d  = np.stack((-bond * np.cos(angle) * np.ones_like(torsion),
+                       bond * np.sin(angle) * np.cos(torsion),
+                       bond * np.sin(angle) * np.sin(torsion)), axis=-1)
+        return c + d[..., 0, None] * bc + d[..., 1, None] * m + d[..., 2, None] * n
+
+    @staticmethod
+    def build(torsions):
+        """
+        (..., length, 3) phi/psi/omega in degrees to (..., length, 3, 3)
+        N/CA/C coordinates.  The phi of the first residue and the psi and
+        omega of the last one do not affect the result.
+        """
+        tors   = np.radians(np.asarray(torsions, dtype=np.float64))
+        shape  = tors.shape[:-2]
+        length = tors.shape[-2]
+        coords = np.zeros(shape + (length, 3, 3))
+
+        ang = np.pi - FragmentBackbone._N_CA_C
+        coords[..., 0, 1, :] = [FragmentBackbone._N_CA, 0.0, 0.0]
+        coords[..., 0, 2, :] = [FragmentBackbone._N_CA + FragmentBackbone._CA_C * np.cos(ang),
+                                FragmentBackbone._CA_C * np.sin(ang), 0.0]
+        for i in range(1, length):
+            n, ca, c = coords[..., i - 1, 0, :], coords[..., i - 1, 1, :], coords[..., i - 1, 2, :]
+            coords[..., i, 0, :] = FragmentBackbone.place(n, ca, c, FragmentBackbone._C_N,
+                                                          FragmentBackbone._CA_C_N, tors[..., i - 1, 1])
+            coords[..., i, 1, :] = FragmentBackbone.place(ca, c, coords[..., i, 0, :], FragmentBackbone._N_CA,
+                                                          FragmentBackbone._C_N_CA, tors[..., i - 1, 2])
+            coords[..., i, 2, :] = FragmentBackbone.place(c, coords[..., i, 0, :], coords[..., i, 1, :],
+                                                          FragmentBackbone._CA_C, FragmentBackbone._N_CA_C,
+                                                          tors[..., i, 0])
+        return coords
+
+    @staticmethod
+    def dihedral(a, b, c, d):
+        """Dihedral angle a-b-c-d in degrees, over the last axis"""
+        b0 = a - b
+        b1 = c - b
+        b1 = b1 / np.linalg.norm(b1, axis=-1)[..., None]
+        b2 = d - c
+        v  = b0 - np.sum(b0 * b1, axis=-1)[..., None] * b1
+        w  = b2 - np.sum(b2 * b1, axis=-1)[..., None] * b1
+        x  = np.sum(v * w, axis=-1)
+        y  = np.sum(np.cross(b1, v) * w, axis=-1)
+        return np.degrees(np.arctan2(y, x))
+
+    @staticmethod
+    def rmsd(coords, other=None):
+        """
+        RMSD after optimal superposition between every pair of (points x 3)
+        sets in coords (n x points x 3), or between coords and other.
+        """
+        x = coords - coords.mean(axis=1)[:, None, :]
+        y = x if other is None else other - other.mean(axis=1)[:, None, :]
+        h = np.einsum("ipk,jpl->ijkl", x, y)
+        u, s, vt = np.linalg.svd(h)
+        sign = np.sign(np.linalg.det(np.matmul(u, vt)))
+        s[..., 2] *= sign
+        e0 = np.sum(x * x, axis=(1, 2))[:, None] + np.sum(y * y, axis=(1, 2))[None, :]
+        msd = (e0 - 2.0 * np.sum(s, axis=-1)) / x.shape[1]
+        return np.sqrt(np.maximum(msd, 0.0))
@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+# @Author: Jaume Bonet
+# @Date:   2016-04-14 16:20:11
+# @Last Modified by:   Jaume Bonet
+# @Last Modified time: 2016-04-14 16:20:11
+"""
+Binary cache of parsed fragment files.
+
+A cache file holds all the arrays of a FragmentArray:
+
+bytes 0-7  -- magic "ROFRAG01"
+bytes 8-15 -- length of the JSON header (little endian uint64)
+header     -- source path, size and mtime plus dtype, shape and offset
+              of every array
+data       -- raw array data, each array aligned to 64 bytes
+
+Loading memory-maps the file and wraps each array around it, so that its
+cost does not depend on the size of the library.  The cache is only used
+while the path, size and modification time of the source match.
+"""
+import os
+import json
+import mmap
+import struct
+import hashlib
+
+import numpy as np
+
+from .FragmentArray import FragmentArray
+
+
+class FragmentCache(object):
+    """On-disk cache of the FragmentArray of a fragment file"""
+    _MAGIC  = b"ROFRAG01"
+    _ALIGN  = 64
+    _SUFFIX = ".fcache"
+
+    def __init__(self, fragfile, cachedir=None):
+        self.source = os.path.abspath(fragfile)
+        if cachedir is None:
+            self.filename = self.source + self._SUFFIX
+        else:
+            key = hashlib.sha1(self.source.encode("utf-8")).hexdigest()[:16]
+            name = "{0}_{1}{2}".format(os.path.basename(fragfile), key, self._SUFFIX)
+            self.filename = os.path.join(cachedir, name)
+
+    def stamp(self):
+        info = os.stat(self.source)
+        return {"source": self.source, "size": info.st_size, "mtime": info.st_mtime}
+
+    def load(self):
+        """Cached FragmentArray, or None if missing or stale"""
+        if not os.path.isfile(self.filename): return None
+        with open(self.filename, "rb") as fd:
+            if fd.read(8) != self._MAGIC: return None
+            length = struct.unpack("<Q", fd.read(8))[0]
+            header = json.loads(fd.read(length).decode("utf-8"))
+            if header["stamp"] != self.stamp(): return None
+            buff = mmap.mmap(fd.fileno(), 0, access=mmap.ACCESS_READ)
+
+        arrays = {}
+        for name, info in header["arrays"].items():
+            dtype = np.dtype(str(info["dtype"]))
+            count = int(np.prod(info["shape"]))
+            if count == 0:
+                array = np.zeros(info["shape"], dtype=dtype)
+            else:
+                array = np.frombuffer(buff, dtype=dtype, count=count, offset=info["offset"])
+            arrays[name] = array.reshape(info["shape"])
+        return FragmentArray.from_arrays(arrays)
+
+    def save(self, data):
+        """Write a FragmentArray to the cache, replacing the previous one"""
+        names  = FragmentArray.ARRAYS
+        arrays = {}
+        offset = 0
+        for name in names:
+            array  = np.ascontiguousarray(getattr(data, name))
+            offset = -(-offset // self._ALIGN) * self._ALIGN
+            arrays[name] = {"dtype": array.dtype.str, "shape": list(array.shape),
+                            "offset": offset}
+            offset += array.nbytes
+        header = {"stamp": self.stamp(), "arrays": arrays}
+
+        # Data offsets are relative until the header length is known
+        text  = json.dumps(header).encode("utf-8")
+        start = 16 + len(text) + 20 * len(names)
+        start = -(-start // self._ALIGN) * self._ALIGN
+        for info in arrays.values(): info["offset"] += start
+        text  = json.dumps(header).encode("utf-8")
+        text += b" " * (start - 16 - len(text))
+
+        cachedir = os.path.dirname(self.filename)
+        if cachedir and not os.path.isdir(cachedir): os.makedirs(cachedir)
+        tmpfile = "{0}.{1}.tmp".format(self.filename, os.getpid())
+        with open(tmpfile, "wb") as fd:
+            fd.write(self._MAGIC)
+            fd.write(struct.pack("<Q", len(text)))
+            fd.write(text)
+            for name in names:
+                array = np.ascontiguousarray(getattr(data, name))
+                fd.seek(arrays[name]["offset"])
+                fd.write(array.tobytes())
+        os.rename(tmpfile, self.filename)
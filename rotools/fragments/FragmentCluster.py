@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+# @Author: Jaume Bonet
+# @Date:   2016-04-19 15:37:02
+# @Last Modified by:   Jaume Bonet
+# @Last Modified time: 2016-04-19 15:37:02
+"""
+Redundancy clustering of the fragments of a position.
+
+Two fragments are compared by the root mean square of the angular
+differences of their phi/psi/omega, each difference wrapped into
+[-180, 180).  Representatives are picked by farthest-point selection
+starting from the first fragment (the best ranked by the picker): each
+new representative is the fragment farthest from all those already
+picked.  Selection stops at the requested count or when every fragment
+lies within the threshold of a representative.
+"""
+import multiprocessing
+
+import numpy as np
+
+
+def _select_worker(job):
+    torsions, count, threshold = job
+    return FragmentCluster.select(FragmentCluster.distances(torsions), count, threshold)
+
+
+class FragmentCluster(object):
+    """Torsion-space clustering of the fragments of each position"""
+
+    @staticmethod
+    def angular(a, b):
+        """Difference between angles in degrees, wrapped into [-180, 180)"""
+        return (a - b + 180.0) % 360.0 - 180.0
+
+    @staticmethod
+    def distances(torsions):
+        """
+        (fragments x fragments) RMS angular distance between fragments from
+        a (fragments x length x 3) torsion array.  Angles are accumulated
+        one at a time, so memory stays at a single distance matrix.
+        """
+        n      = torsions.shape[0]
+        flat   = FragmentCluster.angular(torsions.reshape(n, -1), 0.0)
+        square = np.zeros((n, n))
+        for k in range(flat.shape[1]):
+            # Both angles in [-180, 180): the wrapped gap is min(d, 360 - d)
+            d = np.abs(np.subtract.outer(flat[:, k], flat[:, k]))
+            np.minimum(d, 360.0 - d, out=d)
+            d *= d
+            square += d
+        return np.sqrt(square / max(flat.shape[1], 1))
+
+    @staticmethod
+    def select(distances, count=None, threshold=None):
+        """
+        Representatives (sorted indexes) and, for every fragment, the index
+        of its closest representative.
+        """
+        n = distances.shape[0]
+        if count is None: count = n
+        chosen  = [0]
+        closest = distances[0].copy()
+        while len(chosen) < min(count, n):
+            nxt = int(np.argmax(closest))
+            if threshold is not None and closest[nxt] <= threshold: break
+            if closest[nxt] == 0: break
+            chosen.append(nxt)
+            closest = np.minimum(closest, distances[nxt])
+        chosen = np.array(sorted(chosen), dtype=np.int64)
+        labels = chosen[np.argmin(distances[chosen], axis=0)]
+        return chosen, labels
+
+    @staticmethod
+    def cluster(data, count=None, threshold=None, processes=1):
+        """
+        Cluster every position of a FragmentArray.  Returns a dictionary of
+        position to (representatives, labels), as in select(), with indexes
+        local to the fragments of the position.
+        """
+        if count is None and threshold is None:
+            raise ValueError("Clustering fragments needs a count or a threshold")
+        positions = [int(x) for x in data.positions]
+        jobs      = [(data.torsions(x), count, threshold) for x in positions]
+        if processes is None: processes = multiprocessing.cpu_count()
+        if processes > 1 and len(jobs) > 1:
+            pool = multiprocessing.Pool(min(processes, len(jobs)))
+            try:
+                results = pool.map(_select_worker, jobs)
+            finally:
+                pool.close()
+                pool.join()
+        else:
+            results = [_select_worker(x) for x in jobs]
+        return dict(zip(positions, results))
@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+# @Author: Jaume Bonet
+# @Date:   2016-04-13 11:02:48
+# @Last Modified by:   Jaume Bonet
+# @Last Modified time: 2016-04-13 11:02:48
+"""
+Lazy access to the positions of a fragment file.
+
+The file is scanned once for its 'position:' headers to get the byte range
+of each position block.  The file is then memory-mapped and a block is only
+parsed, with FragmentParser, the first time its position is requested.
+Lines before the first header are not reachable in this mode.
+
+The byte offsets can be kept in a sidecar file (<fragfile>.idx) that is
+reused as long as the size and modification time of the fragment file do
+not change.
+"""
+import os
+import re
+import mmap
+
+import numpy as np
+
+from .FragmentArray import FragmentArray
+from .FragmentParser import FragmentParser
+
+
+class FragmentIndex(object):
+    """Byte-offset index of the position blocks of a fragment file"""
+    _RE_PNUM = re.compile(b"position:[ \\t]+(\\d+)")
+    _SUFFIX  = ".idx"
+
+    def __init__(self, fragfile):
+        self.fragfile = fragfile
+        self.blocks   = np.zeros(0, dtype=np.int32)
+        self.offsets  = np.zeros(1, dtype=np.int64)
+        self._cache   = {}
+        self._posidx  = {}
+        self._map     = None
+
+    @staticmethod
+    def open(fragfile, sidecar=False):
+        """
+        Index a fragment file.  With sidecar=True the offsets are read from
+        (or written to) <fragfile>.idx.
+        """
+        index = FragmentIndex(fragfile)
+        index._mmap()
+        if not sidecar or not index._load_sidecar():
+            index._scan()
+            if sidecar: index._save_sidecar()
+        index._posidx = {}
+        for i, p in enumerate(index.blocks):
+            index._posidx.setdefault(int(p), []).append(i)
+        return index
+
+    @property
+    def positions(self):
+        return np.array(sorted(self._posidx), dtype=np.int32)
+
+    def has_position(self, pos):
+        return pos in self._posidx
+
+    def position(self, pos):
+        """List of Fragments of a position, parsed on first access"""
+        if pos not in self._cache:
+            self._cache[pos] = self.load(pos)
+        return self._cache[pos].position(pos)
+
+    def load(self, pos):
+        """FragmentArray with the rows of the blocks of a position"""
+        blocks = []
+        for i in self._posidx[pos]:
+            text = self._map[int(self.offsets[i]):int(self.offsets[i + 1])]
+            blocks.append(FragmentParser.parse_lines(text.split(b"\n"), pos, 0)[0])
+        return FragmentArray.from_columns(FragmentParser.concatenate(blocks))
+
+    def array(self):
+        """Every position of the file parsed into a single FragmentArray"""
+        return FragmentArray.from_columns(FragmentParser.parse(self.fragfile))
+
+    def close(self):
+        """Release the memory map of the file"""
+        if isinstance(self._map, mmap.mmap): self._map.close()
+        self._map = None
+
+    @property
+    def nbytes(self):
+        """Memory used by the index and the positions loaded so far"""
+        loaded = sum([x.nbytes for x in self._cache.values()])
+        return self.blocks.nbytes + self.offsets.nbytes + loaded
+
+    def _mmap(self):
+        # The map keeps its own reference to the file; the descriptor is
+        # closed right away
+        with open(self.fragfile, "rb") as fd:
+            if os.fstat(fd.fileno()).st_size > 0:
+                self._map = mmap.mmap(fd.fileno(), 0, access=mmap.ACCESS_READ)
+            else:
+                self._map = b""
+
+    def _scan(self):
+        starts, blocks = [], []
+        hit = self._map.find(b"position:")
+        while hit >= 0:
+            ini = self._map.rfind(b"\n", 0, hit) + 1
+            g   = self._RE_PNUM.match(self._map, hit)
+            if g and len(self._map[ini:hit].strip()) == 0:
+                starts.append(ini)
+                blocks.append(int(g.group(1)))
+            hit = self._map.find(b"position:", hit + 1)
+        self.blocks  = np.array(blocks, dtype=np.int32)
+        self.offsets = np.array(starts + [len(self._map)], dtype=np.int64)
+
+    def _stamp(self):
+        info = os.stat(self.fragfile)
+        return np.array([info.st_size, info.st_mtime], dtype=np.float64)
+
+    def _load_sidecar(self):
+        filename = self.fragfile + self._SUFFIX
+        if not os.path.isfile(filename): return False
+        with open(filename, "rb") as fd:
+            data = np.load(fd)
+            if not np.array_equal(data["stamp"], self._stamp()): return False
+            self.blocks  = data["blocks"]
+            self.offsets = data["offsets"]
+        return True
+
+    def _save_sidecar(self):
+        with open(self.fragfile + self._SUFFIX, "wb") as fd:
+            np.savez(fd, stamp=self._stamp(), blocks=self.blocks,
+                     offsets=self.offsets)
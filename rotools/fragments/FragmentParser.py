@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+# @Author: Jaume Bonet
+# @Date:   2016-04-12 09:31:05
+# @Last Modified by:   Jaume Bonet
+# @Last Modified time: 2016-04-12 09:31:05
+"""
+Vectorized parser for Rosetta fragment files.
+
+The file is read in large blocks of whole lines.  Each block is split into
+position headers, blank lines and fragment lines; fragment lines are padded
+into a (lines x width) byte matrix and the fixed-width columns described in
+Fragment.py are sliced and converted in one pass per column.
+
+The results are identical to FragmentPosition.parse, including the
+posenum/fragnum fallback of FragSet.parse: when a line has no position or
+fragment number, the number of the last 'position:' header and the count of
+blank lines since that header are used.
+"""
+import re
+
+import numpy as np
+
+
+class FragmentParser(object):
+    """Bulk parser of fragment files into FragmentArray columns"""
+    _BLOCKSIZE = 1 << 24
+    _MINWIDTH  = 92
+    _RE_PNUM   = re.compile(b"\\s*position:\\s+(\\d+)")
+
+    @staticmethod
+    def parse(fragfile, blocksize=_BLOCKSIZE):
+        """Columns of a fragment file, ready for FragmentArray.from_columns"""
+        blocks  = []
+        posenum = 0
+        fragnum = 0
+        rest    = b""
+        with open(fragfile, "rb") as fd:
+            while True:
+                block = fd.read(blocksize)
+                if not block:
+                    if len(rest) > 0:
+                        cols, posenum, fragnum = FragmentParser.parse_lines(rest.split(b"\n"), posenum, fragnum)
+                        blocks.append(cols)
+                    break
+                block = rest + block
+                cut   = block.rfind(b"\n")
+                if cut < 0:
+                    rest = block
+                    continue
+                rest  = block[cut + 1:]
+                cols, posenum, fragnum = FragmentParser.parse_lines(block[:cut].split(b"\n"), posenum, fragnum)
+                blocks.append(cols)
+        return FragmentParser.concatenate(blocks)
+
+    @staticmethod
+    def parse_lines(lines, posenum=0, fragnum=0):
+        """
+        Parse a list of byte lines.  posenum and fragnum are the header
+        number and blank line count carried from previous lines; their
+        values after the last line are returned with the columns.
+        """
+        n        = len(lines)
+        stripped = [x.strip() for x in lines]
+        blank    = np.array([len(x) == 0 for x in stripped], dtype=bool)
+        header   = np.zeros(n, dtype=bool)
+        pvalues  = [posenum]
+        for i in [i for i, x in enumerate(stripped) if x.startswith(b"position:")]:
+            g = FragmentParser._RE_PNUM.match(lines[i])
+            if g:
+                header[i] = True
+                pvalues.append(int(g.group(1)))
+
+        # Position of the last header and blank lines since then, per line
+        hidx    = np.flatnonzero(header)
+        hcount  = np.cumsum(header)
+        bcount  = np.cumsum(blank)
+        linepos = np.array(pvalues, dtype=np.int32)[hcount]
+        linefrg = bcount - np.append(-fragnum, bcount[hidx])[hcount]
+        if n > 0:
+            posenum = int(linepos[-1])
+            fragnum = int(linefrg[-1])
+
+        data    = np.flatnonzero(~blank & ~header)
+        columns = FragmentParser._parse_fields([lines[i].rstrip() for i in data])
+        columns["posenum"] = np.where(columns["posenum"] == 0, linepos[data], columns["posenum"])
+        columns["fragnum"] = np.where(columns["fragnum"] == 0, linefrg[data], columns["fragnum"])
+        return columns, posenum, fragnum
+
+    @staticmethod
+    def _parse_fields(lines):
+        m      = len(lines)
+        length = np.array([len(x) for x in lines], dtype=np.int64)
+        width  = max([FragmentParser._MINWIDTH] + [len(x) for x in lines])
+        matrix = np.frombuffer(b"".join([x.ljust(width) for x in lines]),
+                               dtype=np.uint8).reshape(m, width)
+
+        def field(ini, end):
+            block = np.ascontiguousarray(matrix[:, ini:end])
+            return block.view("S{0}".format(end - ini)).reshape(m)
+
+        columns = {}
+        columns["pdb"]    = np.char.strip(field(1, 5))
+        columns["chain"]  = np.char.strip(field(6, 7))
+        columns["resnum"] = field(8, 13).astype(np.int32)
+        columns["aatype"] = np.char.strip(field(14, 15))
+        columns["secstr"] = np.char.strip(field(16, 17))
+        columns["phi"]    = field(17, 26).astype(np.float64)
+        columns["psi"]    = field(26, 35).astype(np.float64)
+        columns["omega"]  = field(35, 44).astype(np.float64)
+
+        # Optional tail: coordinates, unused fields and P/F numbering
+        tail  = length > 44
+        coord = np.full((m, 3), np.nan)
+        xcol  = field(44, 53)
+        withc = tail & (np.char.strip(xcol) != b"")
+        coord[withc, 0] = xcol[withc].astype(np.float64)
+        coord[withc, 1] = field(53, 62)[withc].astype(np.float64)
+        coord[withc, 2] = field(62, 72)[withc].astype(np.float64)
+        columns["coord"] = coord
+
+        columns["ukn1"]    = np.where(tail, field(72, 78), b"").astype("S6")
+        columns["ukn2"]    = np.where(tail, field(79, 85), b"").astype("S6")
+        columns["p"]       = np.where(tail, np.char.strip(field(85, 86)), b"P").astype("S1")
+        columns["f"]       = np.where(tail, np.char.strip(field(90, 91)), b"F").astype("S1")
+        columns["posenum"] = np.zeros(m, dtype=np.int32)
+        columns["fragnum"] = np.zeros(m, dtype=np.int32)
+        columns["posenum"][tail] = field(86, 89)[tail].astype(np.int32)
+        columns["fragnum"][tail] = field(91, width)[tail].astype(np.int32)
+        return columns
+
+    @staticmethod
+    def concatenate(blocks):
+        """Join the columns of several parsed blocks"""
+        if len(blocks) == 0: blocks = [FragmentParser.parse_lines([])[0]]
+        columns = {}
+        for c in blocks[0]:
+            columns[c] = np.concatenate([x[c] for x in blocks])
+        return columns
@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+# @Author: Jaume Bonet
+# @Date:   2016-04-22 14:51:30
+# @Last Modified by:   Jaume Bonet
+# @Last Modified time: 2016-04-22 14:51:30
+"""
+Per-position quality of a fragment set against a reference backbone.
+
+The reference is a (residues x 2 or 3) phi/psi[/omega] table, the first row
+being residue 1, or a secondary structure string (such as Form.structure)
+turned into ideal helix and strand torsions.  Loop residues and NaN values
+are left out of the torsion deviation.
+
+For every fragment, the deviation is the RMS of the angular differences to
+the reference over the residues it covers.  Per position, the table holds
+the best and median deviation, the fraction of fragments under the
+threshold and the fraction of fragment residues whose secondary structure
+agrees with the reference.
+"""
+import numpy as np
+
+from .FragmentCluster import FragmentCluster
+
+
+class FragmentQuality(object):
+    """Vectorized comparison of fragments with a reference backbone"""
+    _IDEAL  = {"H": (-57.0, -47.0, 180.0), "E": (-120.0, 130.0, 180.0)}
+    _LOOP   = {"C": "L"}
+    _FIELDS = [("position", np.int32), ("fragments", np.int32), ("best", np.float64),
+               ("median", np.float64), ("good", np.float64), ("ss_agreement", np.float64)]
+
+    @staticmethod
+    def from_secstr(secstr):
+        """(residues x 3) ideal torsions of a secondary structure string"""
+        torsions = np.full((len(secstr), 3), np.nan)
+        for i, ss in enumerate(secstr):
+            if ss in FragmentQuality._IDEAL: torsions[i] = FragmentQuality._IDEAL[ss]
+        return torsions
+
+    @staticmethod
+    def read(filename):
+        """
+        Torsion table from a text file with phi psi [omega] columns, or
+        resnum phi psi omega.  Residues missing from the file are NaN.
+        """
+        table = np.atleast_2d(np.loadtxt(filename, comments="#"))
+        if table.shape[1] < 4: return table
+        resnum   = table[:, 0].astype(np.int64)
+        torsions = np.full((int(resnum.max()), 3), np.nan)
+        torsions[resnum - 1] = table[:, 1:4]
+        return torsions
+
+    @staticmethod
+    def compute(data, torsions, secstr=None, threshold=30.0):
+        """Quality table (structured array, one row per position) of a FragmentArray"""
+        torsions = np.asarray(torsions, dtype=np.float64)
+        nref     = torsions.shape[0]
+        resid    = data.residue_number() - 1
+        inside   = (resid >= 0) & (resid < nref)
+        ref      = np.full((len(resid), torsions.shape[1]), np.nan)
+        ref[inside] = torsions[resid[inside]]
+
+        frag = np.stack((data.phi, data.psi, data.omega), axis=1)[:, :ref.shape[1]]
+        gap  = FragmentCluster.angular(frag, ref) ** 2
+        used = ~np.isnan(gap)
+        ini  = data.fragptr[:-1]
+        rows = np.diff(data.fragptr) > 0
+        sums = np.zeros(data.n_fragments())
+        cnts = np.zeros(data.n_fragments())
+        sums[rows] = np.add.reduceat(np.where(used, gap, 0.0).sum(axis=1), ini[rows])
+        cnts[rows] = np.add.reduceat(used.sum(axis=1), ini[rows])
+        with np.errstate(invalid="ignore", divide="ignore"):
+            dev = np.sqrt(sums / cnts)
+
+        npos   = len(data.positions)
+        fpos   = np.repeat(np.arange(npos), np.diff(data.posptr))
+        table  = np.zeros(npos, dtype=FragmentQuality._FIELDS)
+        table["position"]  = data.positions
+        table["fragments"] = np.diff(data.posptr)
+
+        valid  = ~np.isnan(dev)
+        vals   = dev[valid]
+        grp    = fpos[valid]
+        vals   = vals[np.lexsort((vals, grp))]
+        count  = np.bincount(grp, minlength=npos)
+        offset = np.append(0, np.cumsum(count))
+        has    = count > 0
+        table["best"]   = np.nan
+        table["median"] = np.nan
+        table["good"]   = np.nan
+        table["best"][has] = vals[offset[:-1][has]]
+        lo = offset[:-1][has] + (count[has] - 1) // 2
+        hi = offset[:-1][has] + count[has] // 2
+        table["median"][has] = (vals[lo] + vals[hi]) / 2.0
+        good = np.bincount(grp, weights=(dev[valid] < threshold).astype(np.float64), minlength=npos)
+        table["good"][has] = good[has] / count[has]
+
+        table["ss_agreement"] = np.nan
+        if secstr is not None:
+            refss = np.array([FragmentQuality._LOOP.get(x, x) for x in secstr] + [""], dtype="S1")
+            rowss = refss[np.where(inside, resid, len(secstr))]
+            known = inside & (rowss != b"")
+            agree = known & (data.secstr == rowss)
+            rowpos = np.repeat(fpos, np.diff(data.fragptr))
+            total  = np.bincount(rowpos[known], minlength=npos)
+            hits   = np.bincount(rowpos[agree], minlength=npos)
+            ok     = total > 0
+            table["ss_agreement"][ok] = hits[ok] / total[ok].astype(np.float64)
+        return table
+
+    @staticmethod
+    def to_text(table):
+        """Compact tab-separated text of a quality table"""
+        text = ["\t".join([x[0] for x in FragmentQuality._FIELDS])]
+        for row in table:
+            text.append("{0}\t{1}\t{2:.2f}\t{3:.2f}\t{4:.3f}\t{5:.3f}".format(*row))
+        return "\n".join(text) + "\n"
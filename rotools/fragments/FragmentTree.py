@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+# @Author: Jaume Bonet
+# @Date:   2016-04-20 12:08:44
+# @Last Modified by:   Jaume Bonet
+# @Last Modified time: 2016-04-20 12:08:44
+"""
+Nearest-neighbour index of fragments in torsion space.
+
+Each fragment is cut to a window of the same length and embedded as the
+sine and cosine of its phi/psi/omega, which removes the +/-180 wrap.  A
+KD-tree over those vectors answers batched queries; the euclidean
+distance d of the embedding relates to the angular differences as
+d^2 = sum(2 * (1 - cos(delta))).
+"""
+import numpy as np
+import scipy.spatial as scsp
+
+
+class FragmentTree(object):
+    """KD-tree over the sin/cos embedded torsions of a set of fragments"""
+
+    def __init__(self):
+        self.length   = 0
+        self.sources  = []
+        self.source   = np.zeros(0, dtype=np.int32)
+        self.position = np.zeros(0, dtype=np.int32)
+        self.fragment = np.zeros(0, dtype=np.int32)
+        self.vectors  = np.zeros((0, 0))
+        self._tree    = None
+
+    @staticmethod
+    def embed(torsions):
+        """(..., length, 3) torsions in degrees to (..., 6 * length) vectors"""
+        rad = np.radians(torsions)
+        emb = np.concatenate((np.sin(rad), np.cos(rad)), axis=-1)
+        return emb.reshape(emb.shape[:-2] + (-1,))
+
+    @staticmethod
+    def windows(torsions, length):
+        """All the (length x 3) windows of a (residues x 3) torsion array"""
+        torsions = np.asarray(torsions, dtype=np.float64)
+        starts   = np.arange(torsions.shape[0] - length + 1)
+        return torsions[starts[:, None] + np.arange(length)]
+
+    @staticmethod
+    def build(fragsets, length=None):
+        """
+        Index the fragments of one or several FragSets.  Fragments are cut
+        to the given window length (by default, the most common fragment
+        length); shorter ones are left out.
+        """
+        if not isinstance(fragsets, (list, tuple)): fragsets = [fragsets]
+        arrays = [x._array() for x in fragsets]
+        if length is None:
+            sizes  = np.concatenate([np.diff(x.fragptr) for x in arrays])
+            length = int(np.argmax(np.bincount(sizes))) if len(sizes) > 0 else 0
+
+        tree = FragmentTree()
+        tree.length  = length
+        tree.sources = [x.title for x in fragsets]
+        source, position, fragment, vectors = [], [], [], []
+        for i, data in enumerate(arrays):
+            keep  = np.flatnonzero(np.diff(data.fragptr) >= length)
+            rows  = data.fragptr[keep][:, None] + np.arange(length)
+            fpos  = np.repeat(np.arange(len(data.positions)), np.diff(data.posptr))[keep]
+            tors  = np.stack((data.phi[rows], data.psi[rows], data.omega[rows]), axis=2)
+            source.append(np.full(len(keep), i, dtype=np.int32))
+            position.append(data.positions[fpos].astype(np.int32))
+            fragment.append((keep - data.posptr[fpos]).astype(np.int32))
+            vectors.append(FragmentTree.embed(tors))
+        tree.source   = np.concatenate(source)
+        tree.position = np.concatenate(position)
+        tree.fragment = np.concatenate(fragment)
+        tree.vectors  = np.concatenate(vectors).reshape(len(tree.source), 6 * length)
+        tree._tree    = scsp.cKDTree(tree.vectors)
+        return tree
+
+    def query(self, torsions, k=1):
+        """
+        Closest fragments to one or many (length x 3) torsion windows.
+        Returns the embedding distances and the indexes of the fragments,
+        both (windows x k); use source, position and fragment to find them
+        (fragment indexes are those of fset[position]).
+        """
+        torsions = np.asarray(torsions, dtype=np.float64)
+        single   = torsions.ndim == 2
+        vectors  = self.embed(torsions.reshape((-1, self.length, 3)))
+        dist, idx = self._tree.query(vectors, k=k)
+        dist = np.asarray(dist).reshape(len(vectors), k)
+        idx  = np.asarray(idx).reshape(len(vectors), k)
+        if single: return dist[0], idx[0]
+        return dist, idx
+
+    def query_target(self, torsions, k=1):
+        """query() on every window of a (residues x 3) target backbone"""
+        return self.query(self.windows(torsions, self.length), k)
+
+    def save(self, filename):
+        with open(filename, "wb") as fd:
+            np.savez(fd, length=self.length, sources=np.array(self.sources),
+                     source=self.source, position=self.position,
+                     fragment=self.fragment, vectors=self.vectors)
+
+    @staticmethod
+    def load(filename):
+        """Read a saved index; the KD-tree is rebuilt from the vectors"""
+        tree = FragmentTree()
+        with open(filename, "rb") as fd:
+            data = np.load(fd)
+            tree.length   = int(data["length"])
+            tree.sources  = [str(x) for x in data["sources"]]
+            tree.source   = data["source"]
+            tree.position = data["position"]
+            tree.fragment = data["fragment"]
+            tree.vectors  = data["vectors"]
+        tree._tree = scsp.cKDTree(tree.vectors)
+        return tree
+
+    def __len__(self):
+        return len(self.source)
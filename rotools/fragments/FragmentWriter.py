@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+# @Author: Jaume Bonet
+# @Date:   2016-04-18 09:12:52
+# @Last Modified by:   Jaume Bonet
+# @Last Modified time: 2016-04-18 09:12:52
+"""
+Bulk formatter of FragmentArray rows into Rosetta fragment lines.
+
+Lines are built as a (rows x 94) byte matrix, each fixed-width column of
+Fragment.py being written at once.  Numbers are rounded on their scaled
+integer value, which matches str.format except for values that lie too
+close to a rounding tie, do not fit their column or are not finite.
+Those blocks, like those with empty or long text fields, are formatted
+line by line in the same way as FragmentPosition.__str__.
+"""
+import numpy as np
+
+
+class FragmentWriter(object):
+    """Formats the fragments of a position as Rosetta text"""
+    _WIDTH = 94
+
+    @staticmethod
+    def header(posenum, neighbors):
+        return " position:{0:>13} neighbors:{1:>13}\n".format(posenum, neighbors)
+
+    @staticmethod
+    def format(array, fini, fend):
+        """
+        Text of the fragments fini:fend of a FragmentArray, one line per
+        row and a blank line between fragments (no trailing newline).
+        """
+        ends  = array.fragptr[fini + 1:fend] - array.fragptr[fini]
+        block = FragmentWriter._matrix(array, int(array.fragptr[fini]), int(array.fragptr[fend]))
+        if block is None:
+            lines = FragmentWriter._lines(array, int(array.fragptr[fini]), int(array.fragptr[fend]))
+            for x in ends: lines[x - 1] += "\n"
+            return "\n".join(lines)
+
+        text = np.full((block.shape[0], FragmentWriter._WIDTH + 1), ord("\n"), dtype=np.uint8)
+        text[:, :-1] = block
+        text = np.insert(text.reshape(-1), ends * text.shape[1], ord("\n"))
+        return text[:-1].tobytes().decode("ascii")
+
+    @staticmethod
+    def _lines(array, ini, end):
+        """Line by line formatting, as in FragmentPosition.__str__"""
+        return [str(x) for x in array.records(ini, end)]
+
+    @staticmethod
+    def _matrix(array, ini, end):
+        n      = end - ini
+        coord  = array.coord[ini:end]
+        withc  = ~np.isnan(coord[:, 0])
+        pdb    = array.pdbs[array.pdb[ini:end]]
+        texts  = [array.chain[ini:end], array.aatype[ini:end], array.secstr[ini:end],
+                  array.p[ini:end], array.f[ini:end]]
+        if n == 0 or np.any(np.char.str_len(pdb) != 4): return None
+        if any([np.any(np.char.str_len(x) != 1) for x in texts]): return None
+        ukn = [array.ukn1[ini:end][withc], array.ukn2[ini:end][withc]]
+        if any([np.any(np.char.str_len(x) != 6) for x in ukn]): return None
+
+        matrix = np.full((n, FragmentWriter._WIDTH), ord(" "), dtype=np.uint8)
+        matrix[:, 1:5] = pdb.view(np.uint8).reshape(n, 4)
+        for col, values in zip((6, 14, 16, 85, 90), texts):
+            matrix[:, col] = values.view(np.uint8)
+        fields = [(8, 5, 0, array.resnum[ini:end]), (18, 8, 3, array.phi[ini:end]),
+                  (27, 8, 3, array.psi[ini:end]), (36, 8, 3, array.omega[ini:end]),
+                  (86, 3, 0, array.posenum[ini:end]), (91, 3, 0, array.fragnum[ini:end])]
+        for col, width, decimals, values in fields:
+            chars = FragmentWriter._fixed(values, width, decimals)
+            if chars is None: return None
+            matrix[:, col:col + width] = chars
+
+        if np.any(withc):
+            m = int(np.sum(withc))
+            for col, axis in ((44, 0), (53, 1), (63, 2)):
+                chars = FragmentWriter._fixed(coord[withc, axis], 9, 3)
+                if chars is None: return None
+                matrix[withc, col:col + 9] = chars
+            matrix[withc, 72:78] = ukn[0].view(np.uint8).reshape(m, 6)
+            matrix[withc, 79:85] = ukn[1].view(np.uint8).reshape(m, 6)
+        return matrix
+
+    @staticmethod
+    def _fixed(values, width, decimals):
+        """
+        Right-aligned text of numbers with a fixed number of decimals as a
+        (n x width) byte matrix, or None if any of them cannot be written
+        exactly this way.
+        """
+        if decimals == 0:
+            number = np.abs(values.astype(np.int64))
+            neg    = values < 0
+        else:
+            if not np.all(np.isfinite(values)) or np.any(np.abs(values) >= 1e7): return None
+            scaled = np.abs(values) * 10 ** decimals
+            if np.any(np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6): return None
+            number = np.rint(scaled).astype(np.int64)
+            neg    = np.signbit(values)
+
+        ndigits = np.ones(len(number), dtype=np.int64)
+        for k in range(1, width + 1):
+            ndigits += number >= 10 ** k
+        ndigits = np.maximum(ndigits, decimals + 1)
+        if np.any(ndigits + (decimals > 0) + neg > width): return None
+
+        # One column per digit, units first, then reversed and the point added
+        slots = np.arange(width - (decimals > 0))
+        nd    = ndigits[:, None]
+        chars = ((number[:, None] // 10 ** slots) % 10).astype(np.uint8) + ord("0")
+        chars[slots >= nd] = ord(" ")
+        chars[neg[:, None] & (slots == nd)] = ord("-")
+        chars = chars[:, ::-1]
+        if decimals > 0:
+            point = np.full((len(number), 1), ord("."), dtype=np.uint8)
+            chars = np.hstack((chars[:, :-decimals], point, chars[:, -decimals:]))
+        return chars
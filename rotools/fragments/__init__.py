@@ -5,3 +5,4 @@
 # @Last Modified time: 2016-03-15 16:26:56
 
 from .FragSet import FragSet
+from .FragLibrary import FragLibrary
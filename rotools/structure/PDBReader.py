@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+# @Author: Jaume Bonet
+# @Date:   2016-04-28 09:15:02
+# @Last Modified by:   Jaume Bonet
+# @Last Modified time: 2016-04-28 09:15:02
+"""
+Lightweight reader of PDB coordinates into NumPy arrays.
+
+ATOM lines are padded into a (atoms x 80) byte matrix and the fixed-width
+columns are sliced and converted at once.  Only the first alternate
+location of each atom is kept.  MODEL records split the atoms into models;
+files without them are a single model.  iter_models() reads a file one
+model at a time, so trajectories of any length fit in memory.
+
+Residues are runs of atoms with the same model, chain, number and
+insertion code.  padded() lays their atoms out as a (residues x atoms x 3)
+array with NaN in the empty slots, which is what the per-residue distance
+definitions work on.
+"""
+import numpy as np
+
+
+class PDBReader(object):
+    """Atom coordinates of a PDB file"""
+    BACKBONE = ("N", "CA", "C", "O")
+
+    def __init__(self):
+        self.model   = np.zeros(0, dtype=np.int32)
+        self.chain   = np.zeros(0, dtype="S1")
+        self.resnum  = np.zeros(0, dtype=np.int32)
+        self.icode   = np.zeros(0, dtype="S1")
+        self.resname = np.zeros(0, dtype="S3")
+        self.atom    = np.zeros(0, dtype="S4")
+        self.coord   = np.zeros((0, 3))
+
+    @staticmethod
+    def parse(filename):
+        with open(filename, "rb") as fd:
+            return PDBReader.parse_lines(fd.read().splitlines())
+
+    @staticmethod
+    def iter_models(filename):
+        """Yield a PDBReader for each model of a file, reading one model at a time"""
+        model = 0
+        atoms = []
+        with open(filename, "rb") as fd:
+            for line in fd:
+                if line.startswith(b"ATOM  "):
+                    atoms.append(line.rstrip(b"\r\n"))
+                elif line.startswith(b"ENDMDL"):
+                    yield PDBReader._model(atoms, model)
+                    model += 1
+                    atoms  = []
+        if len(atoms) > 0: yield PDBReader._model(atoms, model)
+
+    @staticmethod
+    def _model(atoms, model):
+        pdb = PDBReader.parse_lines(atoms)
+        pdb.model[:] = model
+        return pdb
+
+    @staticmethod
+    def parse_lines(lines):
+        """PDBReader of a list of byte lines"""
+        pdb    = PDBReader()
+        model  = 0
+        models = []
+        atoms  = []
+        for line in lines:
+            if line.startswith(b"ATOM  "):
+                atoms.append(line)
+                models.append(model)
+            elif line.startswith(b"ENDMDL"):
+                model += 1
+        if len(atoms) == 0: return pdb
+
+        matrix = np.array(atoms, dtype="S80").view(np.uint8).reshape(len(atoms), 80)
+        matrix = np.where(matrix == 0, ord(" "), matrix).astype(np.uint8)
+
+        def field(ini, end):
+            return matrix[:, ini:end].copy().view("S{0}".format(end - ini)).reshape(-1)
+
+        keep = (field(16, 17) == b" ") | (field(16, 17) == b"A")
+        pdb.model   = np.array(models, dtype=np.int32)[keep]
+        pdb.chain   = field(21, 22)[keep]
+        pdb.resnum  = field(22, 26)[keep].astype(np.int32)
+        pdb.icode   = field(26, 27)[keep]
+        pdb.resname = field(17, 20)[keep]
+        pdb.atom    = np.char.strip(field(12, 16)[keep])
+        pdb.coord   = np.column_stack([field(x, x + 8)[keep].astype(np.float64) for x in (30, 38, 46)])
+        return pdb
+
+    def n_models(self):
+        return int(self.model.max()) + 1 if len(self.model) > 0 else 0
+
+    def chains(self):
+        """Chain identifiers in file order"""
+        names, first = np.unique(self.chain, return_index=True)
+        return [x.decode("ascii") if isinstance(x, bytes) else x for x in names[np.argsort(first)]]
+
+    def select(self, model=None, chain=None):
+        """New PDBReader with the atoms of a model and/or chain"""
+        pdb = self
+        if model is not None:
+            ini, end = np.searchsorted(self.model, [model, model + 1])
+            pdb = self._take(slice(ini, end))
+        if chain is not None: pdb = pdb._take(pdb.chain == chain.encode("ascii"))
+        return pdb
+
+    def residues(self):
+        """First atom of each residue, plus the total number of atoms"""
+        n = len(self.atom)
+        if n == 0: return np.zeros(1, dtype=np.int64)
+        new = np.ones(n, dtype=bool)
+        new[1:] = ((self.model[1:] != self.model[:-1]) | (self.chain[1:] != self.chain[:-1]) |
+                   (self.resnum[1:] != self.resnum[:-1]) | (self.icode[1:] != self.icode[:-1]))
+        return np.append(np.flatnonzero(new), n)
+
+    def padded(self, atoms=None):
+        """
+        Residue numbers, (residues x slots) atom names and (residues x
+        slots x 3) coordinates, NaN padded.  atoms restricts the atoms kept.
+        """
+        pdb = self
+        if atoms is not None:
+            pdb = self._take(np.isin(self.atom, np.array(atoms, dtype="S4")))
+        ptr   = pdb.residues()
+        size  = np.diff(ptr)
+        slots = int(size.max()) if len(size) > 0 else 0
+        rows  = np.repeat(np.arange(len(size)), size)
+        cols  = np.arange(len(pdb.atom)) - np.repeat(ptr[:-1], size)
+        names = np.zeros((len(size), slots), dtype="S4")
+        xyz   = np.full((len(size), slots, 3), np.nan)
+        names[rows, cols] = pdb.atom
+        xyz[rows, cols]   = pdb.coord
+        return pdb.resnum[ptr[:-1]], names, xyz
+
+    def dense(self, atom, first=1, last=None):
+        """
+        (residues x 3) coordinates of one atom with row r - first for residue
+        number r, NaN where missing, for a single model.  For use with
+        ConstraintSet.evaluate.
+        """
+        pick = self.atom == atom.encode("ascii")
+        nums = self.resnum[pick] - first
+        if last is None: last = int(self.resnum.max()) if len(self.resnum) > 0 else first - 1
+        xyz  = np.full((last - first + 1, 3), np.nan)
+        ok   = (nums >= 0) & (nums < len(xyz))
+        xyz[nums[ok]] = self.coord[pick][ok]
+        return xyz
+
+    def _take(self, pick):
+        pdb = PDBReader()
+        for name in ("model", "chain", "resnum", "icode", "resname", "atom", "coord"):
+            setattr(pdb, name, getattr(self, name)[pick])
+        return pdb
+
+    def __len__(self):
+        return len(self.atom)
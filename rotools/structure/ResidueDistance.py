@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+# @Author: Jaume Bonet
+# @Date:   2016-04-28 11:47:20
+# @Last Modified by:   Jaume Bonet
+# @Last Modified time: 2016-04-28 11:47:20
+"""
+Distances between selected pairs of residues of a PDBReader.
+
+Five definitions are computed for each pair at once, from the NaN padded
+(residues x atoms x 3) layout of PDBReader.padded():
+
+min        -- shortest distance between any two atoms
+ca         -- CA to CA
+cb         -- CB to CB (CA for residues without CB, such as glycine)
+geometric  -- between the geometric centres of the residues
+backbone   -- shortest distance between N, CA, C or O atoms
+
+Pairs are processed in blocks to bound the (pairs x atoms x atoms) array.
+"""
+import numpy as np
+
+from .PDBReader import PDBReader
+
+
+class ResidueDistance(object):
+    """Vectorized residue-residue distances"""
+    NAMES  = ("min", "ca", "cb", "geometric", "backbone")
+    _BLOCK = 4096
+
+    @staticmethod
+    def compute(pdb, r1, r2, block=_BLOCK):
+        """
+        Dictionary of the distances between residue numbers r1 and r2
+        (arrays) of a single model and chain; NaN if a residue is missing.
+        """
+        resnum, names, xyz = pdb.padded()
+        r1 = np.asarray(r1, dtype=np.int64)
+        r2 = np.asarray(r2, dtype=np.int64)
+        order = np.argsort(resnum, kind="mergesort")
+        i1 = ResidueDistance._lookup(resnum, order, r1)
+        i2 = ResidueDistance._lookup(resnum, order, r2)
+        ok = (i1 >= 0) & (i2 >= 0)
+
+        ca  = ResidueDistance._atom(names, xyz, b"CA")
+        cb  = ResidueDistance._atom(names, xyz, b"CB")
+        cb  = np.where(np.isnan(cb), ca, cb)
+        with np.errstate(invalid="ignore"):
+            geo = np.nanmean(xyz, axis=1) if xyz.shape[1] > 0 else np.zeros((len(resnum), 3))
+        bck = np.where(np.isin(names, np.array(PDBReader.BACKBONE, dtype="S4"))[..., None],
+                       xyz, np.nan)
+
+        result = dict((x, np.full(len(r1), np.nan)) for x in ResidueDistance.NAMES)
+        a, b = i1[ok], i2[ok]
+        result["ca"][ok]        = ResidueDistance._norm(ca[a] - ca[b])
+        result["cb"][ok]        = ResidueDistance._norm(cb[a] - cb[b])
+        result["geometric"][ok] = ResidueDistance._norm(geo[a] - geo[b])
+        where = np.flatnonzero(ok)
+        for ini in range(0, len(where), block):
+            rows = where[ini:ini + block]
+            result["min"][rows]      = ResidueDistance._closest(xyz[i1[rows]], xyz[i2[rows]])
+            result["backbone"][rows] = ResidueDistance._closest(bck[i1[rows]], bck[i2[rows]])
+        return result
+
+    @staticmethod
+    def _lookup(resnum, order, nums):
+        pos = np.minimum(np.searchsorted(resnum[order], nums), max(len(order) - 1, 0))
+        if len(order) == 0: return np.full(len(nums), -1, dtype=np.int64)
+        return np.where(resnum[order][pos] == nums, order[pos], -1)
+
+    @staticmethod
+    def _atom(names, xyz, atom):
+        hit  = names == atom
+        out  = np.full((len(names), 3), np.nan)
+        rows = np.flatnonzero(np.any(hit, axis=1))
+        out[rows] = xyz[rows, np.argmax(hit[rows], axis=1)]
+        return out
+
+    @staticmethod
+    def _norm(delta):
+        return np.sqrt(np.sum(delta * delta, axis=-1))
+
+    @staticmethod
+    def _closest(a, b):
+        """Shortest distance between the (pairs x atoms x 3) sets a and b"""
+        d = ResidueDistance._norm(a[:, :, None, :] - b[:, None, :, :])
+        d = np.where(np.isnan(d), np.inf, d).reshape(len(d), -1)
+        out = d.min(axis=1) if d.shape[1] > 0 else np.full(len(d), np.inf)
+        return np.where(np.isinf(out), np.nan, out)
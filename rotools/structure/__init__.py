@@ -0,0 +1,8 @@
+# -*- coding: utf-8 -*-
+# @Author: Jaume Bonet
+# @Date:   2016-04-28 09:15:02
+# @Last Modified by:   Jaume Bonet
+# @Last Modified time: 2016-04-28 09:15:02
+
+from .PDBReader import PDBReader
+from .ResidueDistance import ResidueDistance
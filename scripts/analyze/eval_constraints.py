@@ -2,38 +2,107 @@
 # @Author: Jaume Bonet
 # @Date:   2016-03-24 13:17:30
 # @Last Modified by:   Jaume Bonet
-# @Last Modified time: 2016-03-29 10:25:54
+# @Last Modified time: 2016-04-28 15:02:33
 import os
 import sys
-from collections import Counter
-from SBI.structure import PDB, InnerContacts
+import glob
+import argparse
+import multiprocessing
+
+import numpy as np
 
 # Including rotools without adding them to the PYTHONPATH
 scrdir  = os.path.dirname(os.path.realpath(__file__))
 rotools = os.path.join(scrdir, "../..")
 sys.path.append(rotools)
 from rotools.constraints import ConstraintSet
+from rotools.structure import PDBReader, ResidueDistance
+
+CLASSES = ("MIN", "CA", "CB", "GEO", "BCK", "NONE")
+
+
+def get_options(*args, **kwds):
+
+    parser = argparse.ArgumentParser(description="Compare constraint values with the distances of a set of PDB files")
+
+    parser.add_argument('-cst', dest='cstfile', type=str, action='store', required=True,
+                        help='Constraint file')
+    parser.add_argument('-in', dest='infile', type=str, action='store', nargs='+', default=["*.pdb"],
+                        help='PDB file names or glob patterns (def:*.pdb)')
+    parser.add_argument('-range', dest='range', type=float, action='store', default=3.0,
+                        help='Distance around the constraint value to call a match (def:3)')
+    parser.add_argument('-cutoff', dest='cutoff', type=float, action='store', default=35.0,
+                        help='Ignore pairs with a minimum distance over the cutoff (def:35)')
+    parser.add_argument('-cpu', dest='cpu', type=int, action='store', default=None,
+                        help='Processes to evaluate the PDB files (def:all)')
+    parser.add_argument('-out', dest='outfile', type=str, action='store', default=None,
+                        help='Summary table file (def:standard output)')
+    parser.add_argument('-detail', dest='detail', type=str, action='store', default=None,
+                        help='Table file with the distances of every constrained pair (def:none)')
+
+    options = parser.parse_args()
+    infiles = []
+    for x in options.infile:
+        infiles.extend(sorted(glob.glob(x)) if glob.has_magic(x) else [x])
+    options.infile = infiles
+
+    return options
+
+
+def similar_to(value, dist, margin):
+    """
+    Index in CLASSES of the first distance definition (min, ca, cb,
+    geometric, backbone) within margin of the constraint value.
+    """
+    close = np.stack([np.abs(dist[x] - value) <= margin for x in ResidueDistance.NAMES], axis=1)
+    return np.where(np.any(close, axis=1), np.argmax(close, axis=1), len(CLASSES) - 1)
+
+
+def evaluate(job):
+    pdbfile, num1, num2, value, margin, cutoff = job
+    pdb = PDBReader.parse(pdbfile)
+    pdb = pdb.select(model=0, chain=pdb.chains()[0] if len(pdb) > 0 else None)
+    dist = ResidueDistance.compute(pdb, num1, num2)
+    with np.errstate(invalid="ignore"):
+        keep = dist["min"] <= cutoff
+    klass = similar_to(value[keep], dict((x, dist[x][keep]) for x in dist), margin)
+    return pdbfile, np.flatnonzero(keep), dict((x, dist[x][keep]) for x in dist), klass
+
+
+if __name__ == "__main__":
+    options = get_options()
+
+    cs    = ConstraintSet.parse(options.cstfile)
+    num1  = cs.data.num1.copy()
+    num2  = cs.data.num2.copy()
+    value = cs.data.value.copy()
+    jobs  = [(x, num1, num2, value, options.range, options.cutoff) for x in options.infile]
 
+    processes = options.cpu if options.cpu is not None else multiprocessing.cpu_count()
+    if processes > 1 and len(jobs) > 1:
+        pool    = multiprocessing.Pool(min(processes, len(jobs)))
+        results = pool.imap(evaluate, jobs, chunksize=max(1, len(jobs) // (4 * processes)))
+    else:
+        pool    = None
+        results = (evaluate(x) for x in jobs)
 
-def similar_to(d, mind, ca, cb, geo, bck):
-    if mind >= float(d) - 3 and mind <= float(d) + 3: return "MIN"
-    if ca >= float(d) - 3 and ca <= float(d) + 3:     return "CA"
-    if cb >= float(d) - 3 and cb <= float(d) + 3:     return "CB"
-    if geo >= float(d) - 3 and geo <= float(d) + 3:   return "GEO"
-    if bck >= float(d) - 3 and bck <= float(d) + 3:   return "BCK"
-    return "NONE"
-
-
-cs = ConstraintSet.parse(sys.argv[1])
-for f in os.listdir(os.getcwd()):
-    if f.endswith('pdb'):
-        data = []
-        inc = InnerContacts(PDB(f), AA=True, AA_distance=35, HT=False)
-        for cont in inc.AAcontacts[0].contacts:
-            if cs.has_contact(cont.aminoacid1.number, cont.aminoacid2.number):
-                d = cs.get_contact(cont.aminoacid1.number, cont.aminoacid2.number).value
-                s = similar_to(d, cont.min_distance, cont.ca_distance, cont.cb_distance, cont.geometric_distance, cont.backbone_distance)
-                data.append(s)
-                print f, cont.aminoacid1.number, cont.aminoacid2.number, d, cont.min_distance, cont.ca_distance, cont.cb_distance, cont.geometric_distance, cont.backbone_distance, s
-        cc = Counter(data)
-        print "SUMMARY", f, cc, len(data)
+    summary = open(options.outfile, "w") if options.outfile is not None else sys.stdout
+    detail  = open(options.detail, "w") if options.detail is not None else None
+    summary.write("\t".join(("pdb", "pairs") + CLASSES) + "\n")
+    if detail is not None:
+        detail.write("\t".join(("pdb", "num1", "num2", "value") + ResidueDistance.NAMES + ("class",)) + "\n")
+    try:
+        for pdbfile, rows, dist, klass in results:
+            count = np.bincount(klass, minlength=len(CLASSES))
+            summary.write("\t".join([pdbfile, str(len(rows))] + [str(x) for x in count]) + "\n")
+            if detail is None: continue
+            table = np.column_stack([num1[rows], num2[rows], value[rows]] + [dist[x] for x in ResidueDistance.NAMES])
+            for row, k in zip(table.tolist(), klass.tolist()):
+                detail.write("{0}\t{1:.0f}\t{2:.0f}\t{3:.2f}\t{4:.3f}\t{5:.3f}\t{6:.3f}\t{7:.3f}\t{8:.3f}\t{9}\n".format(
+                             pdbfile, *(row + [CLASSES[k]])))
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+        if options.outfile is not None: summary.close()
+        if detail is not None: detail.close()
@@ -2,11 +2,13 @@
 # @Author: Jaume Bonet
 # @Date:   2016-03-15 15:06:45
 # @Last Modified by:   Jaume Bonet
-# @Last Modified time: 2016-03-17 15:39:58
+# @Last Modified time: 2016-04-23 11:20:14
 
 import os
 import sys
+import glob
 import argparse
+import multiprocessing
 
 # Including rotools without adding them to the PYTHONPATH
 scrdir  = os.path.dirname(os.path.realpath(__file__))
@@ -19,23 +21,65 @@ def get_options(*args, **kwds):
 
     parser = argparse.ArgumentParser(description="Plot Rosetta's fragments as an image")
 
-    parser.add_argument('-in', dest='infile', type=str, action='store',
-                        help='Fragment file name')
+    parser.add_argument('-in', dest='infile', type=str, action='store', nargs='+',
+                        help='Fragment file names or glob patterns (several files render in batch)')
     parser.add_argument('-show', dest='show', action='store_true', default=False,
-                        help='Show image with visualizer (def:false)')
+                        help='Show image with visualizer (def:false; single file only)')
     parser.add_argument('-out:prefix', dest='outpref', type=str, action='store',
-                        help='Image output file prefix (def:input name_img)', default=None)
+                        help='Image output file prefix (def:input name_img; single file only)', default=None)
+    parser.add_argument('-out:dir', dest='outdir', type=str, action='store',
+                        help='Image output directory in batch mode (def:current)', default=".")
     parser.add_argument('-out:type', dest='outtype', type=str, action='store',
                         help='Image output file type (png/svg) (def:png)', default="png")
+    parser.add_argument('-cache', dest='cache', action='store_true', default=False,
+                        help='Keep a binary cache of the parsed fragments next to the input (def:false)')
+    parser.add_argument('-cpu', dest='cpu', type=int, action='store',
+                        help='Processes to render in batch mode (def:all)', default=None)
 
     options = parser.parse_args()
-    if options.outpref is None:
-        options.outpref = os.path.split(options.infile)[-1] + "_img"
+    infiles = []
+    for x in options.infile:
+        infiles.extend(sorted(glob.glob(x)) if glob.has_magic(x) else [x])
+    options.infile = infiles
+    options.batch  = len(infiles) > 1
+    if options.batch:
+        options.show    = False
+        options.outpref = None
+    elif options.outpref is None and len(infiles) == 1:
+        options.outpref = os.path.split(infiles[0])[-1] + "_img"
 
     return options
 
+
+def render(job):
+    infile, outpref, outtype, cache, show = job
+    fset = FragSet.parse(infile, engine="fast", cache=cache)
+    fset.plot(fileprefix=outpref, format=outtype, show=show)
+    return outpref + "." + outtype
+
+
 if __name__ == "__main__":
     options = get_options()
 
-    fset = FragSet.parse(options.infile)
-    fset.plot(fileprefix= options.outpref, format=options.outtype, show=options.show )
+    # Headless rendering unless the image is to be shown
+    import matplotlib
+    if not options.show: matplotlib.use("Agg")
+
+    if not options.batch:
+        for x in options.infile:
+            render((x, options.outpref, options.outtype, options.cache, options.show))
+        sys.exit(0)
+
+    if not os.path.isdir(options.outdir): os.makedirs(options.outdir)
+    jobs = [(x, os.path.join(options.outdir, os.path.split(x)[-1] + "_img"),
+             options.outtype, options.cache, False) for x in options.infile]
+    processes = options.cpu if options.cpu is not None else multiprocessing.cpu_count()
+    if processes > 1:
+        pool = multiprocessing.Pool(min(processes, len(jobs)))
+        try:
+            for x in pool.imap_unordered(render, jobs): print(x)
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        for x in jobs: print(render(x))
@@ -24,6 +24,8 @@ def get_options(*args, **kwds):
                         help='JSON Form definition')
     parser.add_argument('-in:id',   dest='inid', type=str, action='store',
                         help='Form identifier', default="form")
+    parser.add_argument('-cpu',     dest='cpu', type=int, action='store',
+                        help='Processes to search the forms (def:1; 0 for all)', default=1)
 
     options = parser.parse_args()
 
@@ -34,6 +36,7 @@ if __name__ == "__main__":
     options = get_options()
 
     fabric  = FormFabric()
+    fabric.processes = options.cpu if options.cpu > 0 else None
     fabric.build(options.inid, options.inform)
     fabric.print_structures()
     fabric.dump()
@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+# @Author: Jaume Bonet
+# @Date:   2016-05-06 12:02:44
+# @Last Modified by:   Jaume Bonet
+# @Last Modified time: 2016-05-06 12:02:44
+import unittest
+
+from rotools.constraints import ConstraintSet
+
+
+class TestConstraintAlgebra(unittest.TestCase):
+
+    def setUp(self):
+        self.cset = ConstraintSet()
+        self.cset.add_constraint(1, 5, 4.0)
+        self.cset.add_constraint(2, 8, 5.0)
+
+    def test_empty_operands(self):
+        empty = ConstraintSet()
+        self.assertEqual(str(self.cset.union(empty)), str(self.cset))
+        self.assertEqual(str(empty.union(self.cset)), str(self.cset))
+        self.assertEqual(str(self.cset.difference(empty)), str(self.cset))
+        self.assertEqual(len(empty.difference(self.cset)), 0)
+        self.assertEqual(len(self.cset.intersection(empty)), 0)
+        for policy in ("first", "last", "min", "max", "mean", "error"):
+            self.assertEqual(str(ConstraintSet.merge([empty, self.cset, empty], policy)), str(self.cset))
+            self.assertEqual(len(ConstraintSet.merge([empty, ConstraintSet()], policy)), 0)
+
+    def test_merge_policy(self):
+        other = ConstraintSet()
+        other.add_constraint(5, 1, 6.0)
+        self.assertEqual(self.cset.union(other, "min").get_contact(1, 5).value, 4.0)
+        self.assertEqual(self.cset.union(other, "mean").get_contact(1, 5).value, 5.0)
+        self.assertRaises(ValueError, self.cset.union, other, "error")
+
+
+if __name__ == '__main__':
+    unittest.main()
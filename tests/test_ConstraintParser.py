@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+# @Author: Jaume Bonet
+# @Date:   2016-05-06 10:12:30
+# @Last Modified by:   Jaume Bonet
+# @Last Modified time: 2016-05-06 10:12:30
+import unittest
+
+from rotools.constraints.ConstraintParser import ConstraintParser
+
+
+class TestConstraintParser(unittest.TestCase):
+
+    def round_trip(self, text):
+        return "".join(ConstraintParser.chunks(ConstraintParser.parse_text(text)))
+
+    def test_bounded(self):
+        text = "AtomPair CA 1 CA 5 BOUNDED 0 5.25 0.25 0.5 TAG\n"
+        self.assertEqual(self.round_trip(text), text)
+
+    def test_circularharmonic(self):
+        text = "Dihedral CA 2 CA 9 CIRCULARHARMONIC 1.571 0.35\n"
+        self.assertEqual(self.round_trip(text), text)
+
+    def test_regular_file(self):
+        text = ("AtomPair CA 1 CA 5 HARMONIC 5.00 3.0 TAG\n"
+                "AtomPair CA 2 CA 8 BOUNDED 0 5.25 0.25\n")
+        self.assertEqual(self.round_trip(text), text)
+
+    def test_harmonic_layout(self):
+        text = "AtomPair CA 3 CA 8 HARMONIC 5.5 3 TAG\n"
+        self.assertEqual(self.round_trip(text), "AtomPair CA 3 CA 8 HARMONIC 5.50 3.0 TAG\n")
+
+
+if __name__ == '__main__':
+    unittest.main()
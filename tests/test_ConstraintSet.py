@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+# @Author: Jaume Bonet
+# @Date:   2016-05-06 11:40:05
+# @Last Modified by:   Jaume Bonet
+# @Last Modified time: 2016-05-06 11:40:05
+import unittest
+
+from rotools.constraints import ConstraintSet
+
+
+class TestConstraintSet(unittest.TestCase):
+
+    def test_empty_lookup(self):
+        c = ConstraintSet()
+        self.assertFalse(c.has_contact(1, 2))
+        self.assertRaises(KeyError, c.get_contact, 1, 2)
+        self.assertEqual(c.has_contacts([1, 3], [2, 4]).tolist(), [False, False])
+        self.assertEqual(c.get_contacts([1, 3], [2, 4]).tolist(), [-1, -1])
+
+    def test_lookup(self):
+        c = ConstraintSet()
+        c.add_constraint(1, 5, 4.0)
+        c.add_constraint(5, 1, 6.0)
+        self.assertTrue(c.has_contact(5, 1))
+        self.assertFalse(c.has_contact(1, 2))
+        self.assertEqual(c.get_contact(1, 5).value, 6.0)
+
+
+if __name__ == '__main__':
+    unittest.main()